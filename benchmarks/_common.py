@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Shared helpers for the benchmark scripts.
+
+The benchmarks import the collection's ``module_utils`` without an Ansible
+installation by exposing this checkout as
+``ansible_collections.thomasvincent.firewall`` on ``sys.path``.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import atexit
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bootstrap():
+    """Make ``ansible_collections.thomasvincent.firewall`` importable."""
+    parts = ROOT.split(os.sep)
+    if parts[-3:-1] == ['ansible_collections', 'thomasvincent'] and parts[-1] == 'firewall':
+        base = os.sep.join(parts[:-3])
+    else:
+        base = tempfile.mkdtemp(prefix='fw-bench-')
+        # rmtree unlinks the symlink and never descends into the checkout.
+        atexit.register(shutil.rmtree, base, True)
+        namespace = os.path.join(base, 'ansible_collections', 'thomasvincent')
+        os.makedirs(namespace)
+        os.symlink(ROOT, os.path.join(namespace, 'firewall'))
+    if base not in sys.path:
+        sys.path.insert(0, base)
+
+
+def synthetic_policy(rules, seed=0, groups=16, elements=8):
+    """Build a policy mapping with ``rules`` generated ``firewall_rules`` entries.
+
+    ``groups`` address groups of ``elements`` distinct IPv4 hosts each are
+    declared, and about a third of the rules reference one of them.
+    """
+    rng = random.Random(seed)
+    address_groups = {}
+    for g in range(groups):
+        hosts = rng.sample(range(1 << 24), elements)
+        address_groups['group%d' % g] = ['10.%d.%d.%d' % (h >> 16, (h >> 8) & 255, h & 255) for h in hosts]
+    firewall_rules = []
+    for i in range(rules):
+        rule = {'name': 'rule-%d' % i, 'dest_port': rng.randint(1, 65535)}
+        kind = rng.random()
+        if kind < 0.3 and groups:
+            rule['source_group'] = 'group%d' % rng.randrange(groups)
+        elif kind < 0.6:
+            rule['source'] = '192.0.2.%d' % rng.randrange(256)
+        if rng.random() < 0.1:
+            rule['action'] = 'drop'
+            rule['log'] = True
+        firewall_rules.append(rule)
+    return {
+        'rules': firewall_rules,
+        'objects': {'address_groups': address_groups, 'port_groups': {'web': [80, 443]}},
+        'defaults': {'policy_v4': 'drop', 'ssh_guard': True, 'log_drops': True},
+    }
+
+
+def in_netns(argv, **kwargs):
+    """Run ``argv`` in a throwaway unprivileged user+network namespace."""
+    return subprocess.run(['unshare', '--user', '--map-root-user', '--net', '--'] + list(argv),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, **kwargs)
+
+
+def best_of(func, repeat=3):
+    """Return the fastest of ``repeat`` timed calls, in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
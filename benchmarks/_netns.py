@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""A three-namespace veth topology and a UDP traffic generator.
+
+::
+
+    client 198.18.1.2 --- 198.18.1.1 dut 198.18.2.1 --- 198.18.2.2 server
+
+The caller must already run as root of its own user+network namespace (see
+``_common.in_netns``); that namespace is the device under test. ``client``
+and ``server`` are child network namespaces held open by a ``sleep``
+process, so the whole topology disappears with the caller and no network,
+root or ``ip netns`` state is needed.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+CLIENT = '198.18.1.2'
+DUT_CLIENT_SIDE = '198.18.1.1'
+DUT_SERVER_SIDE = '198.18.2.1'
+SERVER = '198.18.2.2'
+SINK_PORT = 5201
+ECHO_PORT = 5202
+
+
+def sh(*argv):
+    subprocess.run(argv, check=True, stdout=subprocess.DEVNULL)
+
+
+class Peer(object):
+    """A child network namespace with one veth link back to the dut."""
+
+    def __init__(self, link, address, gateway):
+        own = os.readlink('/proc/self/ns/net')
+        self.proc = subprocess.Popen(['unshare', '--net', 'sleep', 'infinity'])
+        while os.readlink('/proc/%d/ns/net' % self.proc.pid) == own:
+            time.sleep(0.01)
+        sh('ip', 'link', 'add', link, 'type', 'veth', 'peer', 'name', 'eth0', 'netns', str(self.proc.pid))
+        sh('ip', 'addr', 'add', gateway + '/24', 'dev', link)
+        sh('ip', 'link', 'set', link, 'up')
+        self.run('ip', 'link', 'set', 'lo', 'up')
+        self.run('ip', 'addr', 'add', address + '/24', 'dev', 'eth0')
+        self.run('ip', 'link', 'set', 'eth0', 'up')
+        self.run('ip', 'route', 'add', 'default', 'via', gateway)
+
+    def argv(self, *argv):
+        return ['nsenter', '--target', str(self.proc.pid), '--net', '--'] + list(argv)
+
+    def run(self, *argv):
+        sh(*self.argv(*argv))
+
+    def close(self):
+        self.proc.kill()
+        self.proc.wait()
+
+
+class Topology(object):
+
+    def __init__(self):
+        sh('ip', 'link', 'set', 'lo', 'up')
+        self.client = Peer('veth-c', CLIENT, DUT_CLIENT_SIDE)
+        self.server = Peer('veth-s', SERVER, DUT_SERVER_SIDE)
+        with open('/proc/sys/net/ipv4/ip_forward', 'w') as f:
+            f.write('1')
+
+    def close(self):
+        self.client.close()
+        self.server.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def tool(*args):
+    """argv that runs one of the traffic roles below in a fresh interpreter."""
+    return [sys.executable, os.path.abspath(__file__)] + [str(a) for a in args]
+
+
+def sink(port, reply=False, idle=1.0):
+    """Count datagrams until ``idle`` seconds pass without one; print pps.
+
+    With ``reply`` the first datagram of every peer is answered, which
+    makes the flow established in conntrack; that datagram is not counted.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 24)
+    sock.bind(('0.0.0.0', port))
+    sock.settimeout(30)
+    peers = set()
+    count, first, last = 0, None, None
+    try:
+        while True:
+            if reply:
+                data, peer = sock.recvfrom(2048)
+                if peer not in peers:
+                    peers.add(peer)
+                    sock.sendto(data, peer)
+                    continue
+            else:
+                sock.recv(2048)
+            last = time.perf_counter()
+            if first is None:
+                first = last
+                sock.settimeout(idle)
+            count += 1
+    except socket.timeout:
+        pass
+    elapsed = (last - first) if count > 1 else 0
+    print('%d %f' % (count, count / elapsed if elapsed else 0.0))
+
+
+def blast(address, port, duration, size, handshake=False):
+    """Send ``size``-byte datagrams to ``address`` for ``duration`` seconds.
+
+    With ``handshake`` the flow first waits for a reply from a replying
+    ``sink``, so the rest of it is established.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect((address, port))
+    if handshake:
+        sock.settimeout(0.5)
+        for _ in range(10):
+            try:
+                sock.send(b'hello')
+                sock.recv(16)
+                break
+            except (socket.timeout, OSError):
+                continue
+        sock.settimeout(None)
+    payload = b'\0' * size
+    sent = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for _ in range(256):
+            try:
+                sock.send(payload)
+                sent += 1
+            except OSError:
+                pass
+    print(sent)
+
+
+def echo(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('0.0.0.0', port))
+    while True:
+        data, peer = sock.recvfrom(2048)
+        sock.sendto(data, peer)
+
+
+def ping(address, port, count):
+    """Round trips from a fresh socket each, so every probe is a new flow."""
+    samples = []
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.settimeout(1.0)
+        sock.connect((address, port))
+        start = time.perf_counter()
+        try:
+            sock.send(b'x')
+            sock.recv(16)
+            samples.append((time.perf_counter() - start) * 1e6)
+        except socket.timeout:
+            pass
+        sock.close()
+    print(' '.join('%.1f' % s for s in samples))
+
+
+if __name__ == '__main__':
+    role, args = sys.argv[1], sys.argv[2:]
+    if role == 'sink':
+        sink(int(args[0]), args[1:] == ['reply'])
+    elif role == 'blast':
+        blast(args[0], int(args[1]), float(args[2]), int(args[3]), args[4:] == ['handshake'])
+    elif role == 'echo':
+        echo(int(args[0]))
+    elif role == 'ping':
+        ping(args[0], int(args[1]), int(args[2]))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Address-group collapse benchmark.
+
+Compares ``nft_cidr.collapse`` with NumPy, with the packed-array fallback
+and the ``ipaddress.collapse_addresses`` path it replaced, on random IPv4
+prefixes and ranges::
+
+    python3 benchmarks/bench_cidr.py --sizes 100000 1000000
+
+Reports the best wall time and the peak traced allocation of each path,
+and checks that they produce identical elements.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import ipaddress
+import json
+import random
+import tracemalloc
+
+from _common import best_of, bootstrap
+
+bootstrap()
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils import nft_cidr  # noqa: E402
+
+NUMPY = nft_cidr.numpy
+
+
+def ipaddress_collapse(entries):
+    """The ``ipaddress`` implementation ``collapse`` used before, kept for comparison."""
+    v4, v6 = [], []
+    for entry in entries:
+        text = str(entry).strip()
+        if '-' in text:
+            first, last = (ipaddress.ip_address(part.strip()) for part in text.split('-', 1))
+            networks = ipaddress.summarize_address_range(first, last)
+        else:
+            networks = [ipaddress.ip_network(text, strict=False)]
+        for network in networks:
+            (v4 if network.version == 4 else v6).append(network)
+    return ([nft_cidr.element(n) for n in ipaddress.collapse_addresses(v4)],
+            [nft_cidr.element(n) for n in ipaddress.collapse_addresses(v6)])
+
+
+def packed_collapse(entries):
+    nft_cidr.numpy = None
+    try:
+        return nft_cidr.collapse(entries)
+    finally:
+        nft_cidr.numpy = NUMPY
+
+
+METHODS = [('ipaddress', ipaddress_collapse), ('packed', packed_collapse)]
+if NUMPY is not None:
+    METHODS.append(('numpy', nft_cidr.collapse))
+
+
+def entries(size, seed=0):
+    """Random prefixes from /16 to /32, one in ten a short range."""
+    rng = random.Random(seed)
+    result = []
+    for _ in range(size):
+        value = rng.randrange(1 << 24, 224 << 24)
+        if rng.random() < 0.1:
+            last = min(value + rng.randrange(1 << 12), (224 << 24) - 1)
+            result.append('%s-%s' % (ipaddress.IPv4Address(value), ipaddress.IPv4Address(last)))
+        else:
+            result.append('%s/%d' % (ipaddress.IPv4Address(value), rng.randint(16, 32)))
+    return result
+
+
+def peak_mb(func, data):
+    tracemalloc.start()
+    try:
+        func(data)
+        return round(tracemalloc.get_traced_memory()[1] / 1048576.0, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='emit JSON instead of a table')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        data = entries(size)
+        reference = None
+        row = {'entries': size}
+        for name, func in METHODS:
+            output = func(data)
+            if reference is None:
+                reference = output
+                row['elements'] = len(output[0]) + len(output[1])
+            elif output != reference:
+                raise SystemExit('%s output differs from ipaddress at %d entries' % (name, size))
+            row[name + '_s'] = best_of(lambda: func(data), args.repeat)
+            row[name + '_peak_mb'] = peak_mb(func, data)
+        results.append(row)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    names = [name for name, _ in METHODS]
+    print('%10s %10s ' % ('entries', 'elements') + ' '.join('%20s' % name for name in names))
+    for row in results:
+        print('%10d %10d ' % (row['entries'], row['elements']) + ' '.join(
+            '%9.3fs %7.1fMB' % (row[name + '_s'], row[name + '_peak_mb']) for name in names))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Forwarding benchmark with and without a software flowtable.
+
+Uses the client -- dut -- server veth topology of ``bench_packet_path.py``
+and forwards established UDP flows through the dut, once with the compiled
+ruleset as is and once with ``firewall_flowtables`` covering both veth
+links, so established packets take the flowtable fast path::
+
+    python3 benchmarks/bench_flowtable.py --flows 4 --duration 3
+
+Each flow is established (one request and reply) before the measurement,
+as ``flow add`` only offloads established connections. Reports received
+packets per second per variant and the gain. Needs ``nft``, ``ip``,
+``unshare`` and ``nsenter``; no root and no network.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import bootstrap, in_netns, synthetic_policy
+
+bootstrap()
+
+import _netns  # noqa: E402
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_compiler import compile_policy  # noqa: E402
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_ir import Match, Rule  # noqa: E402
+
+TOOLS = ('nft', 'ip', 'unshare', 'nsenter')
+FLOWTABLE = {'name': 'ft', 'devices': ['veth-c', 'veth-s'], 'counter': True}
+
+
+def build(policy, flowtable):
+    """Render the policy, letting new benchmark flows through the forward chain."""
+    compiled, stats = compile_policy(dict(policy, flowtables=[FLOWTABLE] if flowtable else []))
+    chain = compiled.table('inet', 'filter').chain('forward')
+    chain.rules.append(Rule([Match('ip daddr', _netns.SERVER), Match('udp dport', str(_netns.SINK_PORT))],
+                            verdict='accept'))
+    return compiled.render()
+
+
+def forward(topology, args):
+    sink = subprocess.Popen(topology.server.argv(*_netns.tool('sink', _netns.SINK_PORT, 'reply')),
+                            stdout=subprocess.PIPE, universal_newlines=True)
+    time.sleep(0.3)
+    senders = [subprocess.Popen(topology.client.argv(*_netns.tool('blast', _netns.SERVER, _netns.SINK_PORT,
+                                                                  args.duration, args.size, 'handshake')),
+                                stdout=subprocess.PIPE, universal_newlines=True)
+               for _ in range(args.flows)]
+    sent = sum(int(p.communicate()[0]) for p in senders)
+    received, pps = sink.communicate()[0].split()
+    return {'sent': sent, 'received': int(received), 'pps': round(float(pps))}
+
+
+def inner(args):
+    policy = synthetic_policy(args.rules)
+    results = {}
+    with _netns.Topology() as topology:
+        for variant in ('baseline', 'flowtable'):
+            fd, path = tempfile.mkstemp(suffix='.nft')
+            with os.fdopen(fd, 'w') as f:
+                f.write(build(policy, variant == 'flowtable'))
+            try:
+                _netns.sh('nft', '-f', path)
+            finally:
+                os.unlink(path)
+            samples = [forward(topology, args) for _ in range(args.repeat)]
+            results[variant] = max(samples, key=lambda sample: sample['pps'])
+    baseline = results['baseline']['pps']
+    results['gain_pct'] = round(100.0 * (results['flowtable']['pps'] - baseline) / baseline, 1) if baseline else None
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rules', type=int, default=1000, help='synthetic input rules in the ruleset')
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds of traffic per measurement')
+    parser.add_argument('--flows', type=int, default=4, help='parallel established flows')
+    parser.add_argument('--size', type=int, default=64, help='UDP payload bytes')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--inner', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.inner:
+        inner(args)
+        return
+    missing = [name for name in TOOLS if not shutil.which(name)]
+    if missing:
+        parser.error('missing required tools: %s' % ', '.join(missing))
+
+    proc = in_netns([sys.executable, os.path.abspath(__file__), '--inner'] + sys.argv[1:])
+    if proc.returncode != 0:
+        sys.exit(proc.stderr.strip())
+    print(json.dumps({
+        'kernel': platform.release(),
+        'cpus': os.cpu_count(),
+        'args': {k: v for k, v in vars(args).items() if k != 'inner'},
+        'results': json.loads(proc.stdout),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
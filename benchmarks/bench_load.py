@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Compile, validate and load benchmark for synthetic fleet-scale policies.
+
+Each case is ``RULES,GROUPS,ELEMENTS``: that many ``firewall_rules`` entries
+and address groups of that many hosts. For every case the script records
+compile+render time, ``nft -c`` time, ``nft -f`` load time and the kernel
+memory held by the loaded tables, and prints one JSON document::
+
+    python3 benchmarks/bench_load.py --case 1000,16,8 --case 10000,64,10000
+
+Validation and load run in a throwaway unprivileged user+network namespace,
+so neither root nor the host ruleset is involved; they need ``nft`` and
+``unshare``. Kernel memory is the growth of ``Slab`` + ``VmallocUsed`` in
+``/proc/meminfo`` across the load, so run it on an otherwise idle machine.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import best_of, bootstrap, in_netns, synthetic_policy
+
+bootstrap()
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_compiler import compile_policy  # noqa: E402
+
+DEFAULT_CASES = ['1000,16,8', '10000,64,1000', '10000,16,100000']
+
+
+def kernel_kb():
+    fields = {}
+    with open('/proc/meminfo') as f:
+        for line in f:
+            name, value = line.split(':', 1)
+            fields[name] = int(value.split()[0])
+    return fields.get('Slab', 0) + fields.get('VmallocUsed', 0)
+
+
+def timed(argv):
+    start = time.perf_counter()
+    proc = subprocess.run(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    return time.perf_counter() - start, proc
+
+
+def inner(path):
+    """Run inside the namespace: check, load and measure one ruleset file."""
+    row = {}
+    row['check_s'], proc = timed(['nft', '-c', '-f', path])
+    if proc.returncode != 0:
+        row['error'] = proc.stderr.strip()
+    else:
+        before = kernel_kb()
+        row['load_s'], proc = timed(['nft', '-f', path])
+        row['kernel_kb'] = kernel_kb() - before
+        if proc.returncode != 0:
+            row['error'] = proc.stderr.strip()
+    print(json.dumps(row))
+
+
+def measure(text, repeat):
+    """Best-of timings of ``nft -c``/``nft -f`` and the median memory growth."""
+    fd, path = tempfile.mkstemp(suffix='.nft')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    samples = []
+    try:
+        for _ in range(repeat):
+            proc = in_netns([sys.executable, os.path.abspath(__file__), '--inner', path])
+            if proc.returncode != 0:
+                return {'error': proc.stderr.strip()}
+            sample = json.loads(proc.stdout)
+            if 'error' in sample:
+                return sample
+            samples.append(sample)
+    finally:
+        os.unlink(path)
+    memory = sorted(s['kernel_kb'] for s in samples)
+    return {
+        'check_s': min(s['check_s'] for s in samples),
+        'load_s': min(s['load_s'] for s in samples),
+        'kernel_kb': memory[len(memory) // 2],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--case', action='append', metavar='RULES,GROUPS,ELEMENTS',
+                        help='repeatable; default: %s' % ' '.join(DEFAULT_CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-kernel', action='store_true', help='only measure compile+render')
+    parser.add_argument('--inner', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.inner:
+        inner(args.inner)
+        return
+    if not args.no_kernel and not (shutil.which('nft') and shutil.which('unshare')):
+        parser.error('nft and unshare are required; use --no-kernel to only measure compile+render')
+
+    results = []
+    for case in args.case or DEFAULT_CASES:
+        rules, groups, elements = (int(part) for part in case.split(','))
+        policy = synthetic_policy(rules, groups=groups, elements=elements)
+        ruleset, stats = compile_policy(policy)
+        text = ruleset.render()
+        row = {
+            'rules': rules,
+            'groups': groups,
+            'elements': elements,
+            'rules_emitted': stats['rules_emitted'],
+            'set_elements': stats['set_elements_out'],
+            'ruleset_bytes': len(text),
+            'render_s': best_of(lambda: compile_policy(policy)[0].render(), args.repeat),
+        }
+        if not args.no_kernel:
+            row.update(measure(text, args.repeat))
+        results.append(row)
+
+    print(json.dumps({
+        'kernel': platform.release(),
+        'python': platform.python_version(),
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
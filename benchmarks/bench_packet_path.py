@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Packet-path benchmark: input and forward throughput and latency per ruleset.
+
+Builds a client -- dut -- server veth topology in throwaway unprivileged
+network namespaces, loads the compiled ``table inet filter`` on the dut and
+drives UDP traffic through it::
+
+    python3 benchmarks/bench_packet_path.py --rules 1000 --duration 3
+
+For each ruleset variant (``linear``: aggregation off, ``optimized``: sets
+and verdict maps) and each statement variant on the rule every packet hits
+(none, ``counter``, ``log``) it reports received packets per second and
+round-trip latency percentiles, for traffic to the dut (input chain) and
+through it (forward chain). The synthetic rules are placed in front of the
+benchmark accept rule in both chains, and every probe packet is a new flow,
+so each one walks the whole chain.
+
+Needs ``nft``, ``ip``, ``unshare`` and ``nsenter``; no root and no network.
+The generator is plain Python sockets, so absolute numbers are bounded by
+the sender; compare variants against each other. Log statements in a
+non-initial namespace only reach the kernel log when the
+``net.netfilter.nf_log_all_netns`` sysctl is set, which is reported.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import bootstrap, in_netns, synthetic_policy
+
+bootstrap()
+
+import _netns  # noqa: E402
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_compiler import compile_policy  # noqa: E402
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_ir import Match, Rule  # noqa: E402
+
+RULESETS = ('linear', 'optimized')
+STATEMENTS = {'none': [], 'counter': ['counter'], 'log': ['log prefix "bench: "']}
+TOOLS = ('nft', 'ip', 'unshare', 'nsenter')
+
+
+def build(policy, ruleset, statement):
+    """Render the policy with benchmark accept rules in input and forward."""
+    compiled, stats = compile_policy(dict(policy, optimize=(ruleset == 'optimized')))
+    table = compiled.table('inet', 'filter')
+    ports = (str(_netns.SINK_PORT), str(_netns.ECHO_PORT))
+    statements = STATEMENTS[statement]
+
+    chain = table.chain('input')
+    user_rules = [rule for rule in chain.rules if rule.remark]
+    chain.rules.insert(len(chain.rules) - 1, Rule([Match('udp dport', ports)], list(statements), 'accept'))
+
+    chain = table.chain('forward')
+    chain.rules.extend(user_rules)
+    chain.rules.append(Rule([Match('ip daddr', _netns.SERVER), Match('udp dport', ports)],
+                            list(statements), 'accept'))
+    return compiled.render(), len(user_rules)
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def throughput(topology, target, address, args):
+    receiver = _netns.tool('sink', _netns.SINK_PORT)
+    if target is not None:
+        receiver = target.argv(*receiver)
+    sink = subprocess.Popen(receiver, stdout=subprocess.PIPE, universal_newlines=True)
+    time.sleep(0.3)
+    senders = [subprocess.Popen(topology.client.argv(*_netns.tool('blast', address, _netns.SINK_PORT,
+                                                                  args.duration, args.size)),
+                                stdout=subprocess.PIPE, universal_newlines=True)
+               for _ in range(args.flows)]
+    sent = sum(int(p.communicate()[0]) for p in senders)
+    received, pps = sink.communicate()[0].split()
+    return {'sent': sent, 'received': int(received), 'pps': round(float(pps))}
+
+
+def latency(topology, target, address, args):
+    responder = _netns.tool('echo', _netns.ECHO_PORT)
+    if target is not None:
+        responder = target.argv(*responder)
+    echo = subprocess.Popen(responder)
+    try:
+        time.sleep(0.3)
+        out = subprocess.run(topology.client.argv(*_netns.tool('ping', address, _netns.ECHO_PORT, args.pings)),
+                             stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+    finally:
+        echo.kill()
+        echo.wait()
+    samples = [float(s) for s in out.split()]
+    return {'rtt_p50_us': percentile(samples, 0.5), 'rtt_p99_us': percentile(samples, 0.99),
+            'lost': args.pings - len(samples)}
+
+
+def inner(args):
+    policy = synthetic_policy(args.rules, groups=args.groups, elements=args.elements)
+    results = []
+    with _netns.Topology() as topology:
+        for ruleset in RULESETS:
+            for statement in STATEMENTS:
+                text, rules = build(policy, ruleset, statement)
+                fd, path = tempfile.mkstemp(suffix='.nft')
+                with os.fdopen(fd, 'w') as f:
+                    f.write(text)
+                try:
+                    _netns.sh('nft', '-f', path)
+                finally:
+                    os.unlink(path)
+                row = {'ruleset': ruleset, 'statement': statement, 'chain_rules': rules}
+                for path_name, target, address in (('input', None, _netns.DUT_CLIENT_SIDE),
+                                                   ('forward', topology.server, _netns.SERVER)):
+                    row[path_name] = dict(throughput(topology, target, address, args),
+                                          **latency(topology, target, address, args))
+                results.append(row)
+    print(json.dumps(results))
+
+
+def nf_log_all_netns():
+    try:
+        with open('/proc/sys/net/netfilter/nf_log_all_netns') as f:
+            return f.read().strip() == '1'
+    except (IOError, OSError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rules', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=16)
+    parser.add_argument('--elements', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds of traffic per measurement')
+    parser.add_argument('--flows', type=int, default=2, help='parallel sender processes')
+    parser.add_argument('--size', type=int, default=64, help='UDP payload bytes')
+    parser.add_argument('--pings', type=int, default=2000, help='latency probes per measurement')
+    parser.add_argument('--inner', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.inner:
+        inner(args)
+        return
+    missing = [name for name in TOOLS if not shutil.which(name)]
+    if missing:
+        parser.error('missing required tools: %s' % ', '.join(missing))
+
+    proc = in_netns([sys.executable, os.path.abspath(__file__), '--inner'] + sys.argv[1:])
+    if proc.returncode != 0:
+        sys.exit(proc.stderr.strip())
+    print(json.dumps({
+        'kernel': platform.release(),
+        'cpus': os.cpu_count(),
+        'nf_log_all_netns': nf_log_all_netns(),
+        'args': {k: v for k, v in vars(args).items() if k != 'inner'},
+        'results': json.loads(proc.stdout),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
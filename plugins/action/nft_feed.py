@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Merge address feeds on the controller and load them on the target.
+
+The feed files are streamed and merged once per distinct set of files
+(cached by path, size and modification time, so every fork reuses the
+first one's result), shipped as a gzip file and applied by the
+``nft_feed`` module.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from ansible import constants as C
+from ansible.errors import AnsibleError
+from ansible.module_utils.common.text.converters import to_native
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_cache import CODE_DIGEST
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_feed import (
+    FORMATS,
+    entries,
+    merge,
+    write,
+)
+
+
+def _stream(sources):
+    for source in sources:
+        for entry in entries(source['path'], source['format'], source['column'], source['delimiter']):
+            yield entry
+
+
+def merged_feed(sources, cache_dir):
+    """Return the path of the merged feed for ``sources`` and its stats."""
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, 0o700)
+    identity = []
+    for source in sources:
+        st = os.stat(source['path'])
+        identity.append([source['path'], st.st_size, st.st_mtime, source['format'], source['column'],
+                         source['delimiter']])
+    key = hashlib.sha256(json.dumps([CODE_DIGEST, identity]).encode('utf-8')).hexdigest()
+    path = os.path.join(cache_dir, key + '.gz')
+    with open(os.path.join(cache_dir, key + '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(os.path.join(cache_dir, key + '.json')) as f:
+                return path, json.load(f)
+        except (IOError, OSError, ValueError):
+            pass
+        ipv4, ipv6, stats = merge(_stream(sources))
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        os.close(fd)
+        with gzip.open(tmp, 'wt', compresslevel=1) as f:
+            write(f, ipv4, ipv6)
+        os.rename(tmp, path)
+        with open(os.path.join(cache_dir, key + '.json'), 'w') as f:
+            json.dump(stats, f)
+    return path, stats
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = True
+    _VALID_ARGS = frozenset(('sources', 'family', 'table', 'set', 'batch_bytes', 'state_path', 'cache_dir'))
+
+    def _source(self, source):
+        if not isinstance(source, dict):
+            source = {'path': source}
+        if source.get('format', 'plain') not in FORMATS:
+            raise AnsibleError("nft_feed: unsupported format '%s', expected %s"
+                               % (source['format'], ' or '.join(FORMATS)))
+        return {
+            'path': self._find_needle('files', os.path.expanduser(str(source['path']))),
+            'format': source.get('format', 'plain'),
+            'column': source.get('column', 0),
+            'delimiter': str(source.get('delimiter', ',')),
+        }
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+        args = self._task.args
+        if not args.get('set') or not args.get('sources'):
+            result.update(failed=True, msg='nft_feed: set and sources are required')
+            return result
+
+        try:
+            sources = [self._source(source) for source in args['sources']]
+            path, stats = merged_feed(sources, args.get('cache_dir') or os.path.join(C.DEFAULT_LOCAL_TMP, 'nft_feed'))
+        except (AnsibleError, ValueError, IOError, OSError) as e:
+            result.update(failed=True, msg='nft_feed: %s' % to_native(e))
+            return result
+
+        try:
+            remote = self._connection._shell.join_path(self._connection._shell.tmpdir, 'feed.gz')
+            self._transfer_file(path, remote)
+            self._fixup_perms2((self._connection._shell.tmpdir, remote))
+            module_args = dict(src=remote, set=args['set'])
+            for name in ('family', 'table', 'batch_bytes', 'state_path'):
+                if args.get(name) is not None:
+                    module_args[name] = args[name]
+            result.update(self._execute_module(module_name='thomasvincent.firewall.nft_feed',
+                                               module_args=module_args, task_vars=task_vars))
+        finally:
+            self._remove_tmp_path(self._connection._shell.tmpdir)
+        result.update(stats)
+        return result
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Validate the compiled rulesets of every play host on the controller.
+
+Run once per play after ``nft_compile``: rulesets are deduplicated by
+fingerprint, each distinct one is checked with ``nft -c`` in a throwaway
+unprivileged namespace, and the task fails naming the hosts of every
+invalid ruleset before any of them is touched.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import time
+
+from ansible import constants as C
+from ansible.module_utils.common.text.converters import to_native
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_validate import (
+    ValidationError,
+    Validator,
+)
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+    _VALID_ARGS = frozenset(('hosts', 'var', 'jobs', 'cache_dir', 'sandbox', 'nft'))
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        task_vars = task_vars or {}
+        args = self._task.args
+        start = time.time()
+
+        hostvars = task_vars['hostvars']
+        hosts = args.get('hosts') or task_vars.get('ansible_play_hosts') or []
+        var = args.get('var', 'nftables_compiled')
+
+        texts = {}
+        devices = {}
+        owners = {}
+        missing = []
+        for host in hosts:
+            compiled = hostvars[host].get(var) if host in hostvars else None
+            if not compiled:
+                missing.append(host)
+                continue
+            fingerprint = compiled['fingerprint']
+            texts.setdefault(fingerprint, compiled['ruleset'])
+            devices.setdefault(fingerprint, compiled['stats'].get('devices', []))
+            owners.setdefault(fingerprint, []).append(host)
+
+        validator = Validator(
+            nft=args.get('nft', 'nft'),
+            sandbox=boolean(args.get('sandbox', True)),
+            cache_dir=args.get('cache_dir') or os.path.join(C.DEFAULT_LOCAL_TMP, 'nft_validate'),
+            jobs=int(args['jobs']) if args.get('jobs') else None,
+        )
+        try:
+            outcomes, hits = validator.validate(texts, devices)
+        except (ValidationError, OSError) as e:
+            result.update(failed=True, msg='nft_validate: %s' % to_native(e))
+            return result
+
+        invalid = []
+        for fingerprint in sorted(outcomes, key=lambda fp: owners[fp][0]):
+            ok, message = outcomes[fingerprint]
+            if not ok:
+                invalid.append({'fingerprint': fingerprint, 'hosts': owners[fingerprint], 'error': message})
+
+        result.update(
+            changed=False,
+            hosts=len(hosts) - len(missing),
+            hosts_missing=missing,
+            rulesets=len(texts),
+            cache_hits=hits,
+            invalid=invalid,
+            duration_ms=round((time.time() - start) * 1000.0, 1),
+        )
+        if invalid:
+            result['failed'] = True
+            result['msg'] = '; '.join(
+                'ruleset %s for %s is invalid: %s' % (item['fingerprint'][:12], ', '.join(item['hosts']), item['error'])
+                for item in invalid)
+        return result
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Filters that compile firewall policy into nftables rulesets."""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import hashlib
+import os
+
+from ansible import constants as C
+from ansible.errors import AnsibleFilterError
+from ansible.module_utils.common.text.converters import to_native
+from ansible.utils.unsafe_proxy import wrap_var
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_cache import (
+    DiskLRU,
+    RenderCache,
+    policy_fingerprint,
+)
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_compiler import (
+    PolicyError,
+    compile_policy,
+)
+
+
+def _compile(policy, ir):
+    try:
+        ruleset, stats = compile_policy(policy)
+    except PolicyError as e:
+        raise AnsibleFilterError('nft_compile: %s' % to_native(e))
+    text = ruleset.render()
+    result = {
+        'ruleset': text,
+        'stats': stats,
+        'fingerprint': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+    }
+    if ir:
+        result['ir'] = ruleset.to_dict()
+    return result
+
+
+def nft_compile(policy, ir=False, cache_dir=None, cache_max_mb=256):
+    """Compile a policy mapping into ``{'ruleset': <nft text>, 'stats': {...},
+    'fingerprint': <sha256 of the ruleset text>}``.
+
+    With ``ir=True`` the result also carries ``ir``, the serialised IR that
+    ``nft_apply`` diffs in incremental mode.
+
+    Results are cached by a fingerprint of the normalised policy, so hosts
+    sharing a policy compile it once. ``cache_dir`` defaults to a directory
+    under Ansible's per-run local tmp, shared by all forks of the run; point
+    it somewhere persistent to reuse artifacts across runs. ``cache_max_mb``
+    bounds its size.
+
+    The result is marked unsafe so rule names and comments are never
+    re-templated when it is stored with ``set_fact``.
+    """
+    if not isinstance(policy, dict):
+        raise AnsibleFilterError('nft_compile expects a mapping, got %s' % type(policy).__name__)
+    ir = bool(ir)
+    key = policy_fingerprint(policy, ir=ir)
+    try:
+        disk = DiskLRU(cache_dir or os.path.join(C.DEFAULT_LOCAL_TMP, 'nft_compile'), int(cache_max_mb) * 1024 * 1024)
+    except OSError as e:
+        raise AnsibleFilterError('nft_compile: cannot use cache directory: %s' % to_native(e))
+    result, tier = RenderCache(disk).lookup(key, lambda: _compile(policy, ir))
+    result = dict(result, stats=dict(result['stats'], cache=tier, policy_fingerprint=key))
+    return wrap_var(result)
+
+
+class FilterModule(object):
+    def filters(self):
+        return {
+            'nft_compile': nft_compile,
+        }
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Controller-side cache of compiled rulesets keyed by policy fingerprint.
+
+Hosts with byte-identical policies share one compiled artifact. Ansible
+runs every host's task in a fresh worker process, so the cache is a
+directory that every fork of the run (or every run, when the directory is
+persistent) can see. A per-key lock file makes concurrent forks wait for
+the first one instead of compiling the same policy in parallel. Least
+recently used entries are evicted once the byte budget is exceeded.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _code_digest():
+    """Digest of the compiler sources, so stale on-disk entries never match."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(_HERE)):
+        if name.startswith('nft_') and name.endswith('.py'):
+            with open(os.path.join(_HERE, name), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+CODE_DIGEST = _code_digest()
+
+
+def policy_fingerprint(policy, **options):
+    """sha256 over the normalised policy, compile options and compiler code."""
+    document = json.dumps([CODE_DIGEST, policy, options], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(document.encode('utf-8')).hexdigest()
+
+
+class DiskLRU(object):
+    """JSON documents in a directory, evicted by mtime once over budget."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        os.utime(path, None)
+        return value
+
+    def put(self, key, value):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(value, f, separators=(',', ':'))
+        os.rename(tmp, self._path(key))
+        self.evict()
+
+    def lock(self, key):
+        """Return an exclusively locked file object; close it to release."""
+        handle = open(os.path.join(self.directory, key + '.lock'), 'w')
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        # Lock files stay: another fork may be waiting on one, and a new file
+        # under the same name would let two forks compile the key at once.
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+
+
+class RenderCache(object):
+    """Cache whose ``lookup()`` computes each key at most once."""
+
+    def __init__(self, disk):
+        self.disk = disk
+
+    def lookup(self, key, compute):
+        """Return ``(value, tier)`` where tier is 'disk' or 'miss'.
+
+        ``compute()`` builds the value.
+        """
+        handle = self.disk.lock(key)
+        try:
+            value = self.disk.get(key)
+            if value is not None:
+                return value, 'disk'
+            value = compute()
+            self.disk.put(key, value)
+            return value, 'miss'
+        finally:
+            handle.close()
@@ -0,0 +1,614 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Compile a firewall policy into the nftables IR.
+
+A policy is the mapping the nftables role builds from its inventory
+variables::
+
+    {'rules': firewall_rules, 'objects': firewall_objects,
+     'defaults': firewall_defaults, 'optimize': True,
+     'counters': False, 'hits': {}}
+
+``counters`` adds a ``counter`` statement to every rule compiled from
+``firewall_rules``; ``'named'`` instead gives each named rule a counter
+object named after it. ``hits`` maps the rendered text of those rules to
+their packet counts and reorders them hottest first where that is safe.
+Rules with ``notrack: true`` also get raw-priority chains that exempt both
+directions of their traffic from connection tracking, ``ct_timeouts``
+declares per-service ``ct timeout`` policies and ``blocklists`` drops
+sources in a ``netdev`` ingress table.
+
+Named sets are declared with the flags, ``size`` and ``policy`` their
+element counts call for (see ``nft_setsize``); an address or port group
+given as a mapping can override them.
+
+``compile_policy()`` normalises every rule exactly once and returns the
+``Ruleset`` together with a statistics dict for reporting.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import re
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_cidr import collapse
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_ir import (
+    Chain,
+    Match,
+    NftObject,
+    NftSet,
+    Rule,
+    Ruleset,
+    Table,
+    quote,
+    set_literal,
+)
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_optimize import aggregate, group_families, reorder
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_setsize import estimate, hints
+
+VERDICTS = frozenset(('accept', 'drop', 'reject', 'continue', 'return'))
+PROTOCOLS = ('tcp', 'udp')
+
+LIMIT_RATE = re.compile(r'^[0-9]+/(second|minute|hour|day)$')
+
+# Dynamic sets holding the per-source log meters, by address family.
+METER_SETS = ((4, 'ip saddr', 'log_meter_v4', 'ipv4_addr'), (6, 'ip6 saddr', 'log_meter_v6', 'ipv6_addr'))
+METER_TIMEOUT = '1m'
+METER_SIZE = 65535
+
+# Blocklist ingress chains run before everything else on the interface.
+INGRESS_PRIORITY = -500
+
+# Connection states a ``ct timeout`` policy may set, by protocol.
+CT_TIMEOUT_STATES = {
+    'tcp': ('syn_sent', 'syn_recv', 'established', 'fin_wait', 'close_wait', 'last_ack', 'time_wait',
+            'close', 'syn_sent2', 'retrans', 'unacknowledged'),
+    'udp': ('unreplied', 'replied'),
+}
+
+
+class PolicyError(ValueError):
+    """Raised when a policy cannot be compiled."""
+
+
+def _values(value):
+    """Return a match value: a single string or a tuple for a set."""
+    if isinstance(value, (list, tuple)):
+        if len(value) == 1:
+            return str(value[0])
+        return tuple(str(v) for v in value)
+    return str(value)
+
+
+def _verdict(rule, index):
+    action = str(rule.get('action', 'accept'))
+    if action not in VERDICTS and not action.startswith(('jump ', 'goto ')):
+        raise PolicyError("firewall_rules[%d] (%s): unsupported action '%s'"
+                          % (index, rule.get('name', 'unnamed rule'), action))
+    return action
+
+
+def _family_sources(rule, index, groups):
+    """Return ``[(key, value), ...]`` source matches, one per address family."""
+    if 'source_group' in rule:
+        group = rule['source_group']
+        if group not in groups:
+            raise PolicyError("firewall_rules[%d] (%s): unknown address group '%s'"
+                              % (index, rule.get('name', 'unnamed rule'), group))
+        return [('ip saddr', '@%s_v4' % group), ('ip6 saddr', '@%s_v6' % group)]
+    if 'source' in rule:
+        sources = rule['source'] if isinstance(rule['source'], (list, tuple)) else [rule['source']]
+        v4 = [str(s) for s in sources if ':' not in str(s)]
+        v6 = [str(s) for s in sources if ':' in str(s)]
+        return [(key, _values(values)) for key, values in (('ip saddr', v4), ('ip6 saddr', v6)) if values]
+    return [(None, None)]
+
+
+def _rate(value, where):
+    """Validate a ``limit rate`` value; false or empty disables the limit."""
+    if value in (None, False, ''):
+        return None
+    value = str(value).strip()
+    if not LIMIT_RATE.match(value):
+        raise PolicyError("%s: invalid rate '%s', expected N/second, N/minute, N/hour or N/day" % (where, value))
+    return value
+
+
+def _int(defaults, key, default, low, high):
+    value = defaults.get(key, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = None
+    if value is None or not low <= value <= high:
+        raise PolicyError('firewall_defaults.%s must be an integer between %d and %d' % (key, low, high))
+    return value
+
+
+def log_settings(defaults):
+    """Normalise the logging keys of ``firewall_defaults``.
+
+    Returns ``{'limit', 'meter', 'options'}``: the default ``limit rate``,
+    the per-source meter rate and the text appended to every ``log``
+    statement. With ``log_backend: nflog`` packets go to netlink group
+    ``log_group`` for a userspace logger (ulogd2) instead of the kernel log,
+    copying ``log_snaplen`` bytes and batching ``log_queue_threshold``
+    packets per netlink message.
+    """
+    backend = defaults.get('log_backend', 'printk')
+    if backend not in ('printk', 'nflog'):
+        raise PolicyError("firewall_defaults.log_backend: unsupported backend '%s', expected printk or nflog"
+                          % backend)
+    options = ''
+    if backend == 'nflog':
+        options = ' group %d snaplen %d queue-threshold %d' % (
+            _int(defaults, 'log_group', 0, 0, 65535),
+            _int(defaults, 'log_snaplen', 128, 0, 65535),
+            _int(defaults, 'log_queue_threshold', 20, 1, 65535))
+    return {
+        'limit': _rate(defaults.get('log_limit'), 'firewall_defaults.log_limit'),
+        'meter': _rate(defaults.get('log_meter'), 'firewall_defaults.log_meter'),
+        'options': options,
+    }
+
+
+def _log_rules(matches, log, budget, meter, remark=None):
+    """Rules that log what ``matches`` matches, at a bounded rate.
+
+    ``meter`` caps each source address before ``budget``, the ``limit``
+    statement, caps the total, so one noisy source cannot use up the budget.
+    Logging gets a rule of its own because an exceeded limit stops the rule
+    matching, which must not skip the verdict.
+    """
+    statements = [budget] if budget else []
+    statements.append(log)
+    if not meter:
+        return [Rule(list(matches), statements, remark=remark)]
+    families = set(4 if m.key.startswith('ip ') else 6 for m in matches if m.key.startswith(('ip ', 'ip6 ')))
+    return [Rule(list(matches), ['add @%s { %s limit rate %s }' % (name, key, meter)] + statements, remark=remark)
+            for family, key, name, _ in METER_SETS if not families or family in families]
+
+
+def _budget(limit, name, limits):
+    """The ``limit`` statement for a log rate. With ``limits`` the rate
+    becomes the named limit object ``name``, so the rules logging each
+    address family share one budget instead of getting one each."""
+    if not limit:
+        return None
+    if limits is None:
+        return 'limit rate %s' % limit
+    limits[name] = limit
+    return 'limit name %s' % quote(name)
+
+
+def compile_rule(rule, index=0, groups=(), counter=None, logging=None, limits=None):
+    """Lower one ``firewall_rules`` entry into a list of rules.
+
+    Address family specific matches produce one rule per family; a rule
+    that matches nothing produces an empty list. ``counter`` names the
+    counter object the rule updates. ``logging`` comes from
+    ``log_settings()``; with a rate limit (the rule's own ``log_limit``
+    overrides the default) or a meter, a logging rule is preceded by
+    rate-limited log rules instead of carrying the log statement.
+    ``limits`` collects the named limit objects to declare, name to rate.
+    """
+    if not isinstance(rule, dict):
+        raise PolicyError('firewall_rules[%d] must be a mapping, got %s' % (index, type(rule).__name__))
+    logging = logging or log_settings({})
+    budget = None
+    name = rule.get('name')
+    verdict = _verdict(rule, index)
+    statements = []
+    if counter:
+        statements.append('counter name %s' % quote(counter))
+    log = limit = None
+    if rule.get('log', False):
+        log = 'log prefix %s%s' % (_prefix(name or 'FW'), logging['options'])
+        limit = _rate(rule.get('log_limit', logging['limit']),
+                      'firewall_rules[%d] (%s) log_limit' % (index, name or 'unnamed rule'))
+        if not (limit or logging['meter']):
+            statements.append(log)
+            log = None
+        budget = _budget(limit, 'log_%d' % index, limits)
+    lowered = []
+    for matches in _matches(rule, index, groups):
+        if log:
+            lowered.extend(_log_rules(matches, log, budget, logging['meter'], name or 'unnamed rule'))
+        lowered.append(Rule(matches, list(statements), verdict, remark=name or 'unnamed rule'))
+    return lowered
+
+
+def _matches(rule, index, groups):
+    """Yield the match list of each address family ``rule`` applies to."""
+    protocol = rule.get('proto', 'tcp')
+    if protocol not in PROTOCOLS:
+        raise PolicyError("firewall_rules[%d] (%s): unsupported proto '%s', expected %s"
+                          % (index, rule.get('name', 'unnamed rule'), protocol, ' or '.join(PROTOCOLS)))
+    for key, value in _family_sources(rule, index, groups):
+        matches = [Match(key, value)] if key else []
+        if 'dest_port' in rule:
+            matches.append(Match('%s dport' % protocol, _values(rule['dest_port'])))
+        if matches:
+            yield matches
+
+
+def _reply(match):
+    """The match for the reply direction of ``match``."""
+    key = match.key.replace(' saddr', ' daddr').replace(' dport', ' sport')
+    return Match(key, match.value)
+
+
+def _stateless(inbound, groups):
+    """Return the raw prerouting, raw output and filter output rules for
+    every rule with ``notrack: true``.
+
+    Both directions of such a service bypass connection tracking, so
+    neither the prologue's ``ct state established`` accept nor conntrack
+    table entries apply to it: the input rule accepts requests and the
+    output rules accept replies statelessly.
+    """
+    prerouting, raw_output, output = [], [], []
+    for index, rule in inbound:
+        if not isinstance(rule, dict) or not rule.get('notrack', False):
+            continue
+        name = rule.get('name', 'unnamed rule')
+        if 'dest_port' not in rule:
+            raise PolicyError('firewall_rules[%d] (%s): notrack needs dest_port' % (index, name))
+        verdict = _verdict(rule, index)
+        for matches in _matches(rule, index, groups):
+            replies = [_reply(match) for match in matches]
+            prerouting.append(Rule(matches, ['notrack'], remark=name))
+            raw_output.append(Rule(replies, ['notrack'], remark=name))
+            if verdict == 'accept':
+                output.append(Rule(replies, verdict='accept', remark=name))
+    return prerouting, raw_output, output
+
+
+def _counter_names(rules):
+    """Map each rule name to a unique nft identifier for its counter."""
+    names = {}
+    taken = set()
+    for rule in rules:
+        name = rule.get('name') if isinstance(rule, dict) else None
+        if not name or name in names:
+            continue
+        ident = re.sub(r'[^A-Za-z0-9_]', '_', str(name))
+        if not ident[0].isalpha():
+            ident = 'r_' + ident
+        candidate, suffix = ident, 2
+        while candidate in taken:
+            candidate, suffix = '%s_%d' % (ident, suffix), suffix + 1
+        names[name] = candidate
+        taken.add(candidate)
+    return names
+
+
+def _prefix(name):
+    return '"%s: "' % str(name).replace('"', "'")
+
+
+def _members(group, key):
+    """Return the members of a group given as a list or as a mapping with
+    its members under ``key`` and set hint overrides beside them."""
+    if isinstance(group, dict):
+        return list(group.get(key) or [])
+    return list(group or [])
+
+
+def _overrides(group, key):
+    if not isinstance(group, dict):
+        return None
+    return dict((k, v) for k, v in group.items() if k != key)
+
+
+def _static_set(name, set_type, elements, override, where):
+    """Declare a set of known ``elements`` with the hints they call for."""
+    try:
+        interval, size, policy = hints(set_type, elements, override)
+    except ValueError as e:
+        raise PolicyError('%s: %s' % (where, e))
+    options = [('auto-merge', None)] if interval else []
+    if size:
+        options.append(('size', size))
+    options.append(('policy', policy))
+    return NftSet(name, set_type, elements, flags=['interval'] if interval else [], options=options)
+
+
+def _address_sets(name, addresses, stats, where=None, override=None):
+    """Build the ``NAME_v4``/``NAME_v6`` sets for one address group."""
+    where = where or 'address_groups.%s' % name
+    addresses = addresses or []
+    try:
+        v4, v6 = collapse(addresses)
+    except ValueError as e:
+        raise PolicyError('%s: %s' % (where, e))
+    stats['set_elements_in'] += len(addresses)
+    stats['set_elements_out'] += len(v4) + len(v6)
+    return [
+        _static_set('%s_v4' % name, 'ipv4_addr', v4, override, where),
+        _static_set('%s_v6' % name, 'ipv6_addr', v6, override, where),
+    ]
+
+
+def _object_sets(objects, stats):
+    sets = []
+    for name, group in (objects.get('address_groups') or {}).items():
+        sets.extend(_address_sets(name, _members(group, 'addresses'), stats,
+                                  override=_overrides(group, 'addresses')))
+    for name, group in (objects.get('port_groups') or {}).items():
+        sets.append(_static_set(name, 'inet_service', [str(p) for p in _members(group, 'ports')],
+                                _overrides(group, 'ports'), 'port_groups.%s' % name))
+    return sets
+
+
+def _set_memory(tables):
+    """Return the expected kernel memory of every named set."""
+    report = []
+    for table in tables:
+        for nft_set in table.sets:
+            options = dict(nft_set.options)
+            count = len(nft_set.elements)
+            if 'dynamic' in nft_set.flags:
+                # Dynamic sets fill from the packet path; count them full.
+                count = options.get('size', count)
+            backend, total = estimate(nft_set.type, nft_set.flags, options.get('size'), options.get('policy'), count)
+            report.append({'table': '%s %s' % (table.family, table.name), 'set': nft_set.name,
+                           'backend': backend, 'elements': count, 'size': options.get('size'),
+                           'policy': options.get('policy', 'performance'), 'bytes': total})
+    return report
+
+
+def _flowtables(flowtables):
+    """Return the flowtable objects, the forward-chain rules feeding them
+    and the interfaces they reference.
+
+    Each entry is ``{'name', 'devices', 'priority', 'offload', 'counter'}``;
+    established TCP and UDP flows arriving on its devices are added to it,
+    so their later packets skip the forward hook.
+    """
+    objects = []
+    rules = []
+    interfaces = set()
+    for index, flowtable in enumerate(flowtables or []):
+        where = 'firewall_flowtables[%d]' % index
+        if not isinstance(flowtable, dict):
+            raise PolicyError('%s must be a mapping' % where)
+        name = str(flowtable.get('name', 'ft%d' % index))
+        devices = flowtable.get('devices') or []
+        if isinstance(devices, str) or not devices:
+            raise PolicyError('%s (%s): devices must be a non-empty list of interfaces' % (where, name))
+        devices = sorted(set(str(d) for d in devices))
+        interfaces.update(devices)
+        body = ['hook ingress priority %s; devices = %s;' % (flowtable.get('priority', 0), set_literal(devices))]
+        if flowtable.get('offload', False):
+            body.append('flags offload;')
+        if flowtable.get('counter', False):
+            body.append('counter')
+        objects.append(NftObject('flowtable', name, body))
+        iifname = Match('iifname', tuple(devices) if len(devices) > 1 else devices[0])
+        rules.append(Rule([iifname, Match('meta l4proto', ('tcp', 'udp')), Match('ct state', 'established')],
+                          ['flow add @%s' % name]))
+    return objects, rules, sorted(interfaces)
+
+
+def _blocklists(blocklists, groups, stats):
+    """Return the ``netdev`` table dropping blocklisted sources on ingress,
+    or None, and the interfaces it attaches to.
+
+    Each entry is ``{'name', 'interfaces', 'addresses', 'groups', 'feeds'}``;
+    ``groups`` names address groups whose members are added. Every
+    interface gets an ingress chain that drops against the entry's interval
+    sets, before conntrack or the inet chains see the packet. ``feeds`` are
+    files too large for the ruleset: they get empty ``NAME_feed_v4``/
+    ``NAME_feed_v6`` sets, listed in ``stats['feeds']`` for ``nft_feed``
+    to fill.
+    """
+    sets = []
+    chains = {}
+    for index, entry in enumerate(blocklists or []):
+        where = 'firewall_blocklists[%d]' % index
+        if not isinstance(entry, dict):
+            raise PolicyError('%s must be a mapping' % where)
+        name = str(entry.get('name', 'blocklist%d' % index))
+        interfaces = entry.get('interfaces') or []
+        if isinstance(interfaces, str) or not interfaces:
+            raise PolicyError('%s (%s): interfaces must be a non-empty list' % (where, name))
+        addresses = list(entry.get('addresses') or [])
+        for group in entry.get('groups') or []:
+            if group not in groups:
+                raise PolicyError("%s (%s): unknown address group '%s'" % (where, name, group))
+            addresses.extend(_members(groups[group], 'addresses'))
+        sets.extend(_address_sets(name, addresses, stats, '%s (%s)' % (where, name)))
+        prefixes = [name]
+        feeds = entry.get('feeds') or []
+        if feeds:
+            if isinstance(feeds, str) or not all(isinstance(f, str) or (isinstance(f, dict) and f.get('path'))
+                                                 for f in feeds):
+                raise PolicyError('%s (%s): feeds must be a list of paths or mappings with a path' % (where, name))
+            prefixes.append('%s_feed' % name)
+            # Elements are managed by nft_feed, which adds and deletes exact
+            # intervals, so these sets must not auto-merge.
+            sets.extend([NftSet('%s_feed_v4' % name, 'ipv4_addr', flags=['interval']),
+                         NftSet('%s_feed_v6' % name, 'ipv6_addr', flags=['interval'])])
+            stats['feeds'].append({'family': 'netdev', 'table': 'blocklist', 'set': '%s_feed' % name,
+                                   'sources': list(feeds)})
+        for interface in interfaces:
+            chains.setdefault(str(interface), []).extend(
+                Rule([Match(key, '@%s_%s' % (prefix, suffix))], ['counter'], 'drop', remark=name)
+                for prefix in prefixes for key, suffix in (('ip saddr', 'v4'), ('ip6 saddr', 'v6')))
+    if not chains:
+        return None, []
+    return Table('netdev', 'blocklist', sets, [
+        Chain('ingress_%s' % re.sub(r'[^A-Za-z0-9_]', '_', interface), 'filter', 'ingress',
+              INGRESS_PRIORITY, 'accept', rules, device=interface)
+        for interface, rules in sorted(chains.items())
+    ]), sorted(chains)
+
+
+def _ct_timeouts(entries):
+    """Return the ``ct timeout`` objects and the raw-priority rules that
+    assign them.
+
+    Each entry is ``{'name', 'proto', 'dest_port', 'family', 'policy'}``,
+    ``policy`` mapping connection states to seconds. The assignment must
+    happen before conntrack creates the entry, so the rules go in chains at
+    raw priority; the timeout applies to new connections to ``dest_port``,
+    whether they arrive or leave. A ``ct timeout`` object is bound to one
+    layer 3 protocol, so an entry without ``family`` becomes ``NAME_v4``
+    and ``NAME_v6``, each assigned to its own family's connections.
+    """
+    objects = []
+    rules = []
+    for index, entry in enumerate(entries or []):
+        where = 'firewall_conntrack.ct_timeouts[%d]' % index
+        if not isinstance(entry, dict) or not entry.get('name') or 'dest_port' not in entry:
+            raise PolicyError('%s must be a mapping with name and dest_port' % where)
+        name = str(entry['name'])
+        protocol = entry.get('proto', 'tcp')
+        if protocol not in PROTOCOLS:
+            raise PolicyError("%s (%s): unsupported proto '%s', expected %s"
+                              % (where, name, protocol, ' or '.join(PROTOCOLS)))
+        policy = entry.get('policy')
+        if not isinstance(policy, dict) or not policy or set(policy) - set(CT_TIMEOUT_STATES[protocol]):
+            raise PolicyError('%s (%s): policy must map %s states (%s) to seconds'
+                              % (where, name, protocol, ', '.join(CT_TIMEOUT_STATES[protocol])))
+        seconds = []
+        for state in CT_TIMEOUT_STATES[protocol]:
+            if state not in policy:
+                continue
+            try:
+                value = int(policy[state])
+            except (TypeError, ValueError):
+                value = None
+            if value is None or isinstance(policy[state], bool) or value < 1:
+                raise PolicyError("%s (%s): policy %s must be a positive number of seconds, got '%s'"
+                                  % (where, name, state, policy[state]))
+            seconds.append('%s : %d' % (state, value))
+        family = entry.get('family')
+        if family not in (None, 'ip', 'ip6'):
+            raise PolicyError("%s (%s): family must be ip or ip6" % (where, name))
+        for l3proto, nfproto in (('ip', 'ipv4'), ('ip6', 'ipv6')):
+            if family and family != l3proto:
+                continue
+            ident = name if family else '%s_v%s' % (name, nfproto[-1])
+            objects.append(NftObject('ct timeout', ident, [
+                'protocol %s;' % protocol,
+                'l3proto %s;' % l3proto,
+                'policy = { %s };' % ', '.join(seconds),
+            ]))
+            rules.append(Rule([Match('meta nfproto', nfproto),
+                               Match('%s dport' % protocol, _values(entry['dest_port']))],
+                              ['ct timeout set %s' % quote(ident)], remark=name))
+    return objects, rules
+
+
+def _input_prologue(defaults):
+    rules = [Rule([Match('ct state', 'established,related')], verdict='accept')]
+    if defaults.get('allow_loopback', True):
+        rules.append(Rule([Match('iif', 'lo')], verdict='accept'))
+    rules.append(Rule([Match('ct state', 'invalid')], verdict='drop'))
+    if defaults.get('allow_icmp', True):
+        rules.append(Rule([Match('ip protocol', 'icmp')], verdict='accept'))
+        rules.append(Rule([Match('ip6 nexthdr', 'icmpv6')], verdict='accept'))
+    if defaults.get('ssh_guard', True):
+        ports = _values(defaults.get('ssh_ports') or [22])
+        rules.append(Rule([Match('tcp dport', ports)], verdict='accept',
+                          comment='SSH guard - prevent lockout'))
+    return rules
+
+
+def _input_epilogue(defaults, logging, limits):
+    log = 'log prefix "nftables dropped: "' + logging['options']
+    if not defaults.get('log_drops', False):
+        return [Rule(statements=['counter'], verdict='drop')]
+    if not (logging['limit'] or logging['meter']):
+        return [Rule(statements=[log, 'counter'], verdict='drop')]
+    budget = _budget(logging['limit'], 'log_drops', limits)
+    return _log_rules([], log, budget, logging['meter']) + [Rule(statements=['counter'], verdict='drop')]
+
+
+def _meter_sets():
+    return [NftSet(name, set_type, flags=['dynamic', 'timeout'],
+                   options=[('timeout', METER_TIMEOUT), ('size', METER_SIZE)])
+            for _, _, name, set_type in METER_SETS]
+
+
+def compile_policy(policy):
+    """Compile ``policy`` and return ``(Ruleset, stats)``."""
+    policy = policy or {}
+    rules = policy.get('rules') or []
+    objects = policy.get('objects') or {}
+    defaults = policy.get('defaults') or {}
+
+    groups = objects.get('address_groups') or {}
+    inbound = [(index, rule) for index, rule in enumerate(rules)
+               if not isinstance(rule, dict) or rule.get('direction', 'inbound') == 'inbound']
+    counters = policy.get('counters', False)
+    named = _counter_names(rule for _, rule in inbound) if counters == 'named' else {}
+    logging = log_settings(defaults)
+    limits = {}
+    compiled = []
+    for index, rule in inbound:
+        counter = named.get(rule.get('name')) if isinstance(rule, dict) else None
+        compiled.extend(compile_rule(rule, index, groups, counter, logging, limits))
+    emitted, removed = compiled, 0
+    if policy.get('optimize', True):
+        # Rules updating different counters never fold together.
+        emitted, removed = aggregate(group_families(compiled))
+    if counters and counters != 'named':
+        for rule in emitted:
+            rule.statements = ['counter'] + rule.statements
+    report = None
+    if policy.get('hits'):
+        emitted, report = reorder(emitted, policy['hits'])
+
+    input_chain = Chain('input', 'filter', 'input', 0, defaults.get('policy_v4', 'drop'))
+    input_chain.rules = _input_prologue(defaults) + emitted + _input_epilogue(defaults, logging, limits)
+
+    flowtables, offload, devices = _flowtables(policy.get('flowtables'))
+    forward_chain = Chain('forward', 'filter', 'forward', 0, defaults.get('policy_forward', 'drop'), offload + [
+        Rule([Match('ct state', 'established,related')], verdict='accept'),
+        Rule([Match('ct state', 'invalid')], verdict='drop'),
+    ])
+    prerouting, raw_output, stateless = _stateless(inbound, groups)
+    if policy.get('optimize', True):
+        prerouting, raw_output, stateless = [aggregate(group_families(chain))[0]
+                                             for chain in (prerouting, raw_output, stateless)]
+    output_chain = Chain('output', 'filter', 'output', 0, defaults.get('policy_output', 'accept'), [
+        Rule([Match('ct state', 'established,related')], verdict='accept'),
+    ] + stateless)
+    chains = [input_chain, forward_chain, output_chain]
+    if prerouting:
+        chains += [Chain('notrack_prerouting', 'filter', 'prerouting', 'raw', rules=prerouting),
+                   Chain('notrack_output', 'filter', 'output', 'raw', rules=raw_output)]
+    timeouts, assign = _ct_timeouts(policy.get('ct_timeouts'))
+    if assign:
+        chains += [Chain('ct_timeout_prerouting', 'filter', 'prerouting', 'raw', rules=assign),
+                   Chain('ct_timeout_output', 'filter', 'output', 'raw', rules=list(assign))]
+
+    stats = {
+        'rules_in': len(rules),
+        'rules_compiled': len(compiled),
+        'rules_emitted': len(emitted),
+        'rules_removed': removed,
+        'set_elements_in': 0,
+        'set_elements_out': 0,
+        'reorder': report,
+        'devices': devices,
+        'notrack_rules': len(prerouting),
+        'ct_timeouts': len(timeouts),
+        'feeds': [],
+    }
+    sets = _object_sets(objects, stats) + (_meter_sets() if logging['meter'] else [])
+    table = Table('inet', 'filter', sets, chains,
+                  flowtables + timeouts + [NftObject('counter', ident) for ident in sorted(set(named.values()))]
+                  + [NftObject('limit', name, ['rate %s' % rate]) for name, rate in sorted(limits.items())])
+    blocklist, interfaces = _blocklists(policy.get('blocklists'), groups, stats)
+    stats['devices'] = sorted(set(devices) | set(interfaces))
+    tables = [table, blocklist] if blocklist else [table]
+    stats['sets'] = sum(len(t.sets) for t in tables)
+    stats['set_memory'] = _set_memory(tables)
+    stats['set_memory_bytes'] = sum(entry['bytes'] for entry in stats['set_memory'])
+    return Ruleset(tables), stats
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Plan an incremental nftables transaction.
+
+The baseline is the IR applied last time, which ``nft_apply`` stores on the
+host. The live ruleset, read with ``nft -j -t list ruleset`` (terse, so set
+elements are never dumped), supplies rule handles and is checked for drift.
+Any structural change -- tables, chains, set or object declarations -- raises
+``FullReload`` and the caller loads the complete ruleset instead.
+
+A set whose element delta is too large to commit together with the rules
+is rebuilt instead: a shadow copy is declared and filled in transactions of
+its own while the packet path keeps using the live set, and the commit
+transaction only points the rules at the shadow and deletes the old set.
+The state keeps the resulting live names in ``aliases``, so the next plan
+translates the desired IR to them before diffing.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import difflib
+import re
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_cidr import (
+    KEY_BITS,
+    interval_element,
+    intervals,
+)
+
+# Elements per ``add element``/``delete element`` command.
+ELEMENT_CHUNK = 4096
+
+# Elements per shadow fill transaction.
+FILL_ELEMENTS = 65536
+
+# A set rebuilt while its canonical name is live takes this suffix; the next
+# rebuild moves it back to the canonical name.
+SHADOW_SUFFIX = '_b'
+
+SET_REF = re.compile(r'@([A-Za-z0-9_]+)')
+
+
+class FullReload(Exception):
+    """The delta cannot be expressed incrementally; reload everything."""
+
+
+def parse_live(document):
+    """Index ``nft -j list ruleset`` output.
+
+    Returns ``{'tables': {(family, table)}, 'sets': {(family, table, name)},
+    'chains': {(family, table, name): [rule handles in order]}}``.
+    """
+    live = {'tables': set(), 'sets': set(), 'chains': {}}
+    for item in document.get('nftables', []):
+        if 'table' in item:
+            obj = item['table']
+            live['tables'].add((obj['family'], obj['name']))
+        elif 'chain' in item:
+            obj = item['chain']
+            live['chains'].setdefault((obj['family'], obj['table'], obj['name']), [])
+        elif 'set' in item:
+            obj = item['set']
+            live['sets'].add((obj['family'], obj['table'], obj['name']))
+        elif 'rule' in item:
+            obj = item['rule']
+            live['chains'].setdefault((obj['family'], obj['table'], obj['chain']), []).append(obj['handle'])
+    return live
+
+
+def _signature(ir):
+    """Everything whose change requires a full reload."""
+    return [
+        (table['family'], table['name'],
+         [(s['name'], s['type'], s['flags'], s['options']) for s in table['sets']],
+         [(c['name'], c['type'], c['hook'], c['priority'], c['policy'], c.get('device')) for c in table['chains']],
+         table.get('objects', []))
+        for table in ir['tables']
+    ]
+
+
+def _element_commands(verb, ref, elements, commands):
+    for start in range(0, len(elements), ELEMENT_CHUNK):
+        commands.append('%s element %s { %s }' % (verb, ref, ', '.join(elements[start:start + ELEMENT_CHUNK])))
+
+
+def _aliased(ir, aliases):
+    """Return ``ir`` with its sets renamed to their live names.
+
+    ``aliases`` maps ``'family table set'`` to the live name of every set
+    that currently lives under its shadow name; rule references follow.
+    """
+    if not aliases:
+        return ir
+    tables = []
+    for table in ir['tables']:
+        prefix = '%s %s ' % (table['family'], table['name'])
+        names = dict((s['name'], aliases[prefix + s['name']]) for s in table['sets'] if prefix + s['name'] in aliases)
+        if names:
+            def rename(match):
+                return '@' + names.get(match.group(1), match.group(1))
+            table = dict(table,
+                         sets=[dict(s, name=names.get(s['name'], s['name'])) for s in table['sets']],
+                         chains=[dict(c, rules=[SET_REF.sub(rename, rule) for rule in c['rules']])
+                                 for c in table['chains']])
+        tables.append(table)
+    return dict(ir, tables=tables)
+
+
+def _declaration(desired):
+    body = ['type %s;' % desired['type']]
+    if desired['flags']:
+        body.append('flags %s;' % ','.join(desired['flags']))
+    body.extend('%s;' % (key if value is None else '%s %s' % (key, value)) for key, value in desired['options'])
+    return '{ %s }' % ' '.join(body)
+
+
+def _set_changes(previous, desired):
+    """Return the ``(removed, added)`` elements between two set documents."""
+    set_type = desired['type']
+    if 'interval' in desired['flags'] and set_type in KEY_BITS:
+        # Compare merged intervals: an auto-merge set stores adjacent
+        # members as one interval, and deletes must name that interval.
+        old = set(intervals(previous['elements'], set_type))
+        new = set(intervals(desired['elements'], set_type))
+        removed = [interval_element(lo, hi, set_type) for lo, hi in sorted(old - new)]
+        added = [interval_element(lo, hi, set_type) for lo, hi in sorted(new - old)]
+    else:
+        old = set(previous['elements'])
+        new = set(desired['elements'])
+        removed = [e for e in previous['elements'] if e not in new]
+        added = [e for e in desired['elements'] if e not in old]
+    return removed, added
+
+
+def _set_delta(ref, removed, added, commands, delta):
+    _element_commands('delete', ref, removed, commands)
+    _element_commands('add', ref, added, commands)
+    delta['elements_deleted'] += len(removed)
+    delta['elements_added'] += len(added)
+
+
+def _shadow_fill(ref, desired, batches):
+    """Append the transactions declaring and filling the shadow set ``ref``."""
+    elements = desired['elements']
+    commands = ['add set %s %s' % (ref, _declaration(desired))]
+    start = 0
+    while True:
+        chunk = elements[start:start + FILL_ELEMENTS]
+        _element_commands('add', ref, chunk, commands)
+        batches.append({'kind': 'fill', 'set': ref, 'commands': commands, 'elements': len(chunk)})
+        start += FILL_ELEMENTS
+        if start >= len(elements):
+            return
+        commands = []
+
+
+def _chain_delta(ref, old, new, handles, commands, delta):
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        paired = min(i2 - i1, j2 - j1)
+        for k in range(paired):
+            commands.append('replace rule %s handle %s %s' % (ref, handles[i1 + k], new[j1 + k]))
+        for k in range(i1 + paired, i2):
+            commands.append('delete rule %s handle %s' % (ref, handles[k]))
+        # Opcodes alternate with 'equal', so handles[i2] survives the batch.
+        for k in range(j1 + paired, j2):
+            if i2 < len(handles):
+                commands.append('insert rule %s position %s %s' % (ref, handles[i2], new[k]))
+            else:
+                commands.append('add rule %s %s' % (ref, new[k]))
+        delta['rules_replaced'] += paired
+        delta['rules_deleted'] += i2 - i1 - paired
+        delta['rules_added'] += j2 - j1 - paired
+
+
+def plan(previous, desired, live, shadow_threshold=0):
+    """Return ``(batches, delta, state)`` turning ``previous`` into ``desired``.
+
+    ``previous`` is the state a previous plan returned (or a
+    ``Ruleset.to_dict()`` document), ``desired`` a ``Ruleset.to_dict()``
+    document and ``live`` comes from ``parse_live()``. ``batches`` are the
+    transactions to run in order, dicts with ``kind`` (``fill`` or
+    ``commit``) and ``commands``; only the last, ``commit``, changes what
+    packets see. ``state`` is ``desired`` under the live set names plus
+    their ``aliases``, the baseline for the next plan.
+
+    A set with more than ``shadow_threshold`` changed elements (0 never) is
+    rebuilt through a shadow set instead of being changed in place. Raises
+    ``FullReload`` when the change is structural or the live ruleset no
+    longer matches ``previous``.
+    """
+    if not previous:
+        raise FullReload('no previous incremental state')
+    aliases = dict(previous.get('aliases') or {})
+    current = _aliased(desired, aliases)
+    if _signature(previous) != _signature(current):
+        raise FullReload('tables, chains, set or object declarations changed')
+    batches = []
+    commands = []
+    dropped = []
+    delta = dict(rules_added=0, rules_deleted=0, rules_replaced=0, elements_added=0, elements_deleted=0,
+                 sets_swapped=0, elements_filled=0)
+    for old_table, new_table, canonical in zip(previous['tables'], current['tables'], desired['tables']):
+        family, table = new_table['family'], new_table['name']
+        if (family, table) not in live['tables']:
+            raise FullReload('table %s %s is not loaded' % (family, table))
+        live_sets = set(s for f, t, s in live['sets'] if (f, t) == (family, table))
+        if live_sets != set(s['name'] for s in new_table['sets']):
+            raise FullReload('sets in table %s %s drifted' % (family, table))
+        live_chains = set(c for f, t, c in live['chains'] if (f, t) == (family, table))
+        if live_chains != set(c['name'] for c in new_table['chains']):
+            raise FullReload('chains in table %s %s drifted' % (family, table))
+        for old_set, new_set, name in zip(old_table['sets'], new_table['sets'], (s['name'] for s in canonical['sets'])):
+            ref = '%s %s %s' % (family, table, new_set['name'])
+            removed, added = _set_changes(old_set, new_set)
+            if (shadow_threshold and len(removed) + len(added) > shadow_threshold
+                    and 'dynamic' not in new_set['flags'] and 'timeout' not in new_set['flags']):
+                shadow = name + SHADOW_SUFFIX if new_set['name'] == name else name
+                _shadow_fill('%s %s %s' % (family, table, shadow), new_set, batches)
+                dropped.append('delete set %s' % ref)
+                if shadow == name:
+                    del aliases['%s %s %s' % (family, table, name)]
+                else:
+                    aliases['%s %s %s' % (family, table, name)] = shadow
+                delta['sets_swapped'] += 1
+                delta['elements_filled'] += len(new_set['elements'])
+            else:
+                _set_delta(ref, removed, added, commands, delta)
+    # Swapped sets change the rules that reference them into ``replace
+    # rule`` commands, which must precede deleting the old sets.
+    current = _aliased(desired, aliases)
+    for old_table, new_table in zip(previous['tables'], current['tables']):
+        family, table = new_table['family'], new_table['name']
+        for old_chain, new_chain in zip(old_table['chains'], new_table['chains']):
+            handles = live['chains'][(family, table, new_chain['name'])]
+            if len(handles) != len(old_chain['rules']):
+                raise FullReload('chain %s %s %s drifted (%d live rules, %d expected)'
+                                 % (family, table, new_chain['name'], len(handles), len(old_chain['rules'])))
+            ref = '%s %s %s' % (family, table, new_chain['name'])
+            _chain_delta(ref, old_chain['rules'], new_chain['rules'], handles, commands, delta)
+    commands.extend(dropped)
+    if commands:
+        batches.append({'kind': 'commit', 'commands': commands})
+    return batches, delta, dict(current, aliases=aliases)
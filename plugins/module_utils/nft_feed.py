@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Stream address feeds into interval sets in bounded memory.
+
+Threat-intel feeds hold millions of prefixes, far too many to pass through
+inventory variables and templates. ``entries()`` streams one feed file
+(plain or CSV, optionally gzip-compressed), ``merge()`` folds the entries
+into disjoint intervals held as packed integers, and ``write()`` stores
+them as sorted lines keyed by family and bounds. On the target ``diff()``
+walks that file and the one loaded last time side by side, and
+``transactions()`` turns the differences into ``delete``/``add element``
+commands of bounded size, so neither side ever holds the rendered feed.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import csv
+import gzip
+import io
+from array import array
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_cidr import (
+    address_bounds,
+    interval_element,
+    merge_bounds,
+    merge_ipv4,
+)
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Text per ``nft -f`` transaction. Each element expands to two netlink
+# interval elements, so this keeps a batch well inside the socket buffer.
+BATCH_BYTES = 256 * 1024
+
+FORMATS = ('plain', 'csv')
+
+
+def _open(path):
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        return io.TextIOWrapper(gzip.open(path), encoding='utf-8', errors='replace')
+    return io.open(path, encoding='utf-8', errors='replace')
+
+
+def entries(path, format='plain', column=0, delimiter=','):
+    """Yield the address entries of one feed file.
+
+    ``plain`` takes the first word of every line, ignoring ``#`` and ``;``
+    comments (the Spamhaus DROP layout). ``csv`` takes ``column``, an index
+    or a header name, skipping rows that start with ``#``.
+    """
+    with _open(path) as f:
+        if format == 'csv':
+            reader = csv.reader(f, delimiter=delimiter)
+            index = column
+            if not isinstance(column, int) and not str(column).isdigit():
+                header = next(reader, [])
+                if column not in header:
+                    raise ValueError("%s: no column '%s'" % (path, column))
+                index = header.index(column)
+            index = int(index)
+            for row in reader:
+                if len(row) > index and not row[0].startswith('#'):
+                    value = row[index].strip()
+                    if value:
+                        yield value
+        else:
+            for line in f:
+                words = line.split('#', 1)[0].split(';', 1)[0].split()
+                if words:
+                    yield words[0]
+
+
+def merge(values):
+    """Return ``(ipv4, ipv6, stats)`` merged intervals of ``values``.
+
+    IPv4 bounds are packed into a 64-bit integer while reading, so the
+    feed costs eight bytes per entry until it is merged (see
+    ``nft_cidr.merge_ipv4``). Invalid entries are skipped and counted in
+    ``stats``.
+    """
+    v4 = array('Q')
+    v6 = []
+    total = invalid = 0
+    for value in values:
+        total += 1
+        try:
+            version, lo, hi = address_bounds(value)
+        except ValueError:
+            invalid += 1
+            continue
+        if version == 4:
+            v4.append(lo << 32 | hi)
+        else:
+            v6.append((lo, hi))
+    ipv4 = merge_ipv4(v4)
+    ipv6 = merge_bounds(sorted(v6))
+    return ipv4, ipv6, {'entries': total, 'invalid': invalid, 'elements': len(ipv4) + len(ipv6)}
+
+
+def _line(version, lo, hi):
+    if version == 4:
+        return '4 %08x %08x %s' % (lo, hi, interval_element(lo, hi, 'ipv4_addr'))
+    return '6 %032x %032x %s' % (lo, hi, interval_element(lo, hi, 'ipv6_addr'))
+
+
+def write(f, ipv4, ipv6):
+    """Write merged intervals to text file ``f`` as sorted, keyed lines."""
+    for lo, hi in ipv4:
+        f.write(_line(4, lo, hi) + '\n')
+    for lo, hi in ipv6:
+        f.write(_line(6, lo, hi) + '\n')
+
+
+def element_line(element):
+    """Return the line ``write()`` produces for one element as nft lists it."""
+    return _line(*address_bounds(element))
+
+
+def lines(path):
+    """Yield the element lines of a file ``write()`` produced, if it exists."""
+    try:
+        f = _open(path)
+    except (IOError, OSError):
+        return
+    with f:
+        for line in f:
+            if line[:1] in ('4', '6'):
+                yield line.rstrip('\n')
+
+
+def diff(old, new):
+    """Yield ``('delete', line)`` and ``('add', line)`` between two sorted line streams."""
+    old, new = iter(old), iter(new)
+    a, b = next(old, None), next(new, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a < b):
+            yield 'delete', a
+            a = next(old, None)
+        elif a is None or b < a:
+            yield 'add', b
+            b = next(new, None)
+        else:
+            a, b = next(old, None), next(new, None)
+
+
+def transactions(family, table, prefix, changes, max_bytes=BATCH_BYTES):
+    """Yield ``(command, deleted, added)`` for a ``diff()`` stream.
+
+    Each command is one transaction holding the deletes and the adds of a
+    run of keys, deletes first since the new elements may overlap the ones
+    they replace, so a changed prefix is never missing from the set between
+    two transactions. A transaction ends at the family boundary, or once it
+    holds ``max_bytes`` of element text and the next change starts above
+    every interval in it.
+    """
+    pending = {'delete': [], 'add': []}
+    current = reach = None
+    size = 0
+    for verb, line in changes:
+        version, lo, hi, element = line.split(' ', 3)
+        lo, hi = int(lo, 16), int(hi, 16)
+        if size and (version != current or (size + len(element) + 2 > max_bytes and lo > reach)):
+            yield _transaction(family, table, prefix, current, pending)
+            pending = {'delete': [], 'add': []}
+            reach, size = None, 0
+        current = version
+        reach = hi if reach is None else max(reach, hi)
+        pending[verb].append(element)
+        size += len(element) + 2
+    if size:
+        yield _transaction(family, table, prefix, current, pending)
+
+
+def _transaction(family, table, prefix, version, pending):
+    command = ''.join(
+        '%s element %s %s %s_v%s { %s }\n' % (verb, family, table, prefix, version, ', '.join(pending[verb]))
+        for verb in ('delete', 'add') if pending[verb])
+    return command, len(pending['delete']), len(pending['add'])
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Intermediate representation for nftables rulesets.
+
+The compiler lowers ``firewall_rules`` and ``firewall_objects`` into these
+objects once; ``Ruleset.render()`` then emits ``nft -f`` text in a single
+pass over the tree. ``Ruleset.to_dict()`` gives the JSON-serialisable form
+(rules as rendered text) that ``nft_apply`` diffs against the live ruleset.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+INDENT = '    '
+
+# Elements per line when a set literal is wrapped.
+ELEMENTS_PER_LINE = 16
+
+
+def quote(text):
+    """Return ``text`` as an nft string literal.
+
+    nft has no escape for ``"`` inside a string, so it is replaced.
+    """
+    return '"%s"' % str(text).replace('"', "'")
+
+
+def set_literal(values):
+    """Render an anonymous set ``{ a, b, c }``."""
+    return '{ %s }' % ', '.join(values)
+
+
+class Match(object):
+    """A single ``<key> <value>`` match expression.
+
+    ``value`` is a string (literal, range or ``@set`` reference) or a
+    tuple of strings, which renders as an anonymous set.
+    """
+
+    __slots__ = ('key', 'value')
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+    def render(self):
+        if isinstance(self.value, tuple):
+            return '%s %s' % (self.key, set_literal(self.value))
+        return '%s %s' % (self.key, self.value)
+
+
+class Rule(object):
+    """One rule: matches, then statements, then an optional verdict.
+
+    ``vmap`` is an optional ``(key, [(value, verdict), ...])`` verdict map
+    rendered after the statements, in place of a plain verdict.
+    ``remark`` is emitted as a ``#`` line above the rule and never reaches
+    the kernel; ``comment`` is attached to the rule itself.
+    """
+
+    __slots__ = ('matches', 'statements', 'verdict', 'comment', 'remark', 'vmap')
+
+    def __init__(self, matches=None, statements=None, verdict=None, comment=None, remark=None, vmap=None):
+        self.matches = matches or []
+        self.statements = statements or []
+        self.verdict = verdict
+        self.comment = comment
+        self.remark = remark
+        self.vmap = vmap
+
+    def render(self):
+        parts = [m.render() for m in self.matches]
+        parts.extend(self.statements)
+        if self.vmap:
+            key, entries = self.vmap
+            parts.append('%s vmap %s' % (key, set_literal('%s : %s' % entry for entry in entries)))
+        if self.verdict:
+            parts.append(self.verdict)
+        if self.comment:
+            parts.append('comment ' + quote(self.comment))
+        return ' '.join(parts)
+
+
+class NftSet(object):
+    """A named set declared inside a table."""
+
+    __slots__ = ('name', 'type', 'flags', 'elements', 'options')
+
+    def __init__(self, name, type, elements=None, flags=None, options=None):
+        self.name = name
+        self.type = type
+        self.elements = elements or []
+        self.flags = flags or []
+        # Ordered (keyword, value) pairs; value None renders the bare keyword.
+        self.options = options or []
+
+    def render(self, lines, indent):
+        inner = indent + INDENT
+        lines.append('%sset %s {' % (indent, self.name))
+        lines.append('%stype %s' % (inner, self.type))
+        if self.flags:
+            lines.append('%sflags %s' % (inner, ','.join(self.flags)))
+        for key, value in self.options:
+            lines.append(inner + (key if value is None else '%s %s' % (key, value)))
+        if self.elements:
+            elements = [str(e) for e in self.elements]
+            if len(elements) <= ELEMENTS_PER_LINE:
+                lines.append('%selements = %s' % (inner, set_literal(elements)))
+            else:
+                wrap = ',\n' + inner + INDENT
+                chunks = [', '.join(elements[i:i + ELEMENTS_PER_LINE])
+                          for i in range(0, len(elements), ELEMENTS_PER_LINE)]
+                lines.append('%selements = {\n%s%s\n%s}' % (inner, inner + INDENT, wrap.join(chunks), inner))
+        lines.append('%s}' % indent)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'type': self.type,
+            'flags': list(self.flags),
+            'options': [[key, value] for key, value in self.options],
+            'elements': [str(e) for e in self.elements],
+        }
+
+
+class NftObject(object):
+    """A named stateful object declared inside a table.
+
+    ``kind`` is the declaration keyword (``counter``, ``ct timeout``, ...)
+    and ``body`` the statement lines inside its braces.
+    """
+
+    __slots__ = ('kind', 'name', 'body')
+
+    def __init__(self, kind, name, body=None):
+        self.kind = kind
+        self.name = name
+        self.body = body or []
+
+    def render(self, lines, indent):
+        lines.append('%s%s %s {' % (indent, self.kind, self.name))
+        lines.extend(indent + INDENT + line for line in self.body)
+        lines.append('%s}' % indent)
+
+    def to_dict(self):
+        return {'kind': self.kind, 'name': self.name, 'body': list(self.body)}
+
+
+class Chain(object):
+    """A chain; base chains carry ``type``/``hook``/``priority``.
+
+    ``device`` is the interface of a netdev ``ingress`` base chain.
+    """
+
+    __slots__ = ('name', 'type', 'hook', 'priority', 'policy', 'rules', 'device')
+
+    def __init__(self, name, type=None, hook=None, priority=0, policy=None, rules=None, device=None):
+        self.name = name
+        self.type = type
+        self.hook = hook
+        self.priority = priority
+        self.policy = policy
+        self.rules = rules or []
+        self.device = device
+
+    def header(self):
+        if not self.hook:
+            return None
+        hook = '%s device %s' % (self.hook, quote(self.device)) if self.device else self.hook
+        text = 'type %s hook %s priority %s;' % (self.type, hook, self.priority)
+        if self.policy:
+            text += ' policy %s;' % self.policy
+        return text
+
+    def render(self, lines, indent):
+        inner = indent + INDENT
+        lines.append('%schain %s {' % (indent, self.name))
+        header = self.header()
+        if header:
+            lines.append(inner + header)
+        for rule in self.rules:
+            if rule.remark:
+                lines.append('%s# %s' % (inner, rule.remark))
+            lines.append(inner + rule.render())
+        lines.append('%s}' % indent)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'type': self.type,
+            'hook': self.hook,
+            'priority': self.priority,
+            'policy': self.policy,
+            'device': self.device,
+            'rules': [rule.render() for rule in self.rules],
+        }
+
+
+class Table(object):
+    __slots__ = ('family', 'name', 'sets', 'chains', 'objects')
+
+    def __init__(self, family, name, sets=None, chains=None, objects=None):
+        self.family = family
+        self.name = name
+        self.sets = sets or []
+        self.chains = chains or []
+        self.objects = objects or []
+
+    def chain(self, name):
+        for chain in self.chains:
+            if chain.name == name:
+                return chain
+        raise KeyError(name)
+
+    def render(self, lines):
+        lines.append('table %s %s {' % (self.family, self.name))
+        for obj in self.objects:
+            obj.render(lines, INDENT)
+            lines.append('')
+        for nft_set in self.sets:
+            nft_set.render(lines, INDENT)
+            lines.append('')
+        for chain in self.chains:
+            chain.render(lines, INDENT)
+            lines.append('')
+        if lines[-1] == '':
+            lines.pop()
+        lines.append('}')
+
+    def to_dict(self):
+        return {
+            'family': self.family,
+            'name': self.name,
+            'sets': [nft_set.to_dict() for nft_set in self.sets],
+            'chains': [chain.to_dict() for chain in self.chains],
+            'objects': [obj.to_dict() for obj in self.objects],
+        }
+
+
+class Ruleset(object):
+    """Top-level container; renders a complete ``nft -f`` document."""
+
+    __slots__ = ('tables', 'flush')
+
+    def __init__(self, tables=None, flush=True):
+        self.tables = tables or []
+        self.flush = flush
+
+    def table(self, family, name):
+        for table in self.tables:
+            if table.family == family and table.name == name:
+                return table
+        raise KeyError('%s %s' % (family, name))
+
+    def render(self):
+        lines = []
+        if self.flush:
+            lines.extend(['flush ruleset', ''])
+        for table in self.tables:
+            table.render(lines)
+            lines.append('')
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {'flush': self.flush, 'tables': [table.to_dict() for table in self.tables]}
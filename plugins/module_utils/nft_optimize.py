@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Optimizer passes over compiled nftables rules.
+
+``aggregate()`` folds runs of consecutive rules that share a match shape
+and differ in exactly one match value into a single rule: an anonymous set
+when the verdicts agree, a verdict map when they do not. Only consecutive
+rules are folded and the folded values must be pairwise disjoint, so the
+first rule a packet matches -- and therefore its verdict -- is unchanged.
+``continue`` and ``jump`` verdicts let evaluation carry on, so a rule after
+one of them is never treated as shadowed by it.
+
+``group_families()`` runs first so the per-family rules a dual-stack rule
+lowers to end up adjacent to their siblings and can fold.
+
+``reorder()`` moves frequently hit rules ahead of colder ones, but only past
+rules they commute with: rules no packet can match both of, or rules with
+the same verdict and statements.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import bisect
+import ipaddress
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_ir import Match, Rule
+
+# Verdicts that may appear as verdict map values; ``reject`` is a statement.
+MAP_VERDICTS = frozenset(('accept', 'drop', 'continue', 'return'))
+
+# Remarks on folded rules list at most this many source rule names.
+REMARK_NAMES = 3
+
+
+def _span(key, value):
+    """Return a comparable ``(domain, lo, hi)`` span for ``value``, or None."""
+    if key.endswith(('dport', 'sport')):
+        lo, _, hi = value.partition('-')
+        if not lo.isdigit() or (hi and not hi.isdigit()):
+            return None
+        return ('port', int(lo), int(hi or lo))
+    if key.endswith(('saddr', 'daddr')):
+        try:
+            if '-' in value:
+                first, last = (ipaddress.ip_address(v.strip()) for v in value.split('-', 1))
+            else:
+                network = ipaddress.ip_network(value, strict=False)
+                first, last = network.network_address, network.broadcast_address
+        except ValueError:
+            return None
+        return ('ipv%d' % first.version, int(first), int(last))
+    return None
+
+
+class _Spans(object):
+    """Sorted, non-overlapping spans with O(log n) membership checks."""
+
+    def __init__(self):
+        self.starts = []
+        self.spans = []
+
+    def find(self, span):
+        """Return 'new', 'duplicate' or 'overlap' for ``span``."""
+        index = bisect.bisect_left(self.starts, span[:2])
+        for neighbour in self.spans[max(index - 1, 0):index + 1]:
+            if neighbour == span:
+                return 'duplicate'
+            if neighbour[0] == span[0] and neighbour[1] <= span[2] and span[1] <= neighbour[2]:
+                return 'overlap'
+        return 'new'
+
+    def add(self, span):
+        index = bisect.bisect_left(self.starts, span[:2])
+        self.starts.insert(index, span[:2])
+        self.spans.insert(index, span)
+
+
+def _candidates(match):
+    """Return ``[(value, span), ...]`` for a match, or None if it cannot fold.
+
+    Values that are not comparable or that overlap each other cannot fold.
+    """
+    own = _Spans()
+    candidates = []
+    for value in (match.value if isinstance(match.value, tuple) else (match.value,)):
+        span = _span(match.key, value)
+        if span is None or own.find(span) != 'new':
+            return None
+        own.add(span)
+        candidates.append((value, span))
+    return candidates
+
+
+def _terminal(verdict):
+    """False for verdicts after which evaluation carries on to the next rule."""
+    return verdict != 'continue' and not str(verdict).startswith('jump ')
+
+
+def _foldable(rule):
+    return rule.vmap is None and bool(rule.matches) and bool(rule.verdict)
+
+
+def _pivot(base, rule):
+    """Return the single match index where ``rule`` differs from ``base``.
+
+    Returns -1 for identical matches and None when the rules cannot fold.
+    """
+    if not _foldable(rule) or len(rule.matches) != len(base.matches):
+        return None
+    if rule.statements != base.statements or rule.comment != base.comment:
+        return None
+    pivot = -1
+    for index, (left, right) in enumerate(zip(base.matches, rule.matches)):
+        if left.key != right.key:
+            return None
+        if left.value != right.value:
+            if pivot != -1:
+                return None
+            pivot = index
+    return pivot
+
+
+def _remark(names):
+    names = [n for n in names if n]
+    if len(names) > REMARK_NAMES:
+        return '%s (+%d more)' % (', '.join(names[:REMARK_NAMES]), len(names) - REMARK_NAMES)
+    return ', '.join(names) or None
+
+
+def _fold_run(rules, start):
+    """Fold as many rules as possible from ``rules[start]``; return (end, rule)."""
+    base = rules[start]
+    if not _foldable(base):
+        return start + 1, base
+    pivot = None
+    spans = _Spans()
+    entries = []
+    decided = {}
+    names = [base.remark]
+    end = start + 1
+    while end < len(rules):
+        rule = rules[end]
+        index = _pivot(base, rule)
+        if index is None:
+            break
+        if index == -1:
+            # Identical matches: the rule is shadowed by ``base``, unless
+            # packets carry on past ``base`` and reach it.
+            if not _terminal(base.verdict):
+                break
+            names.append(rule.remark)
+            end += 1
+            continue
+        if pivot is None:
+            seeded = _candidates(base.matches[index])
+            if seeded is None:
+                break
+            for _, span in seeded:
+                spans.add(span)
+                decided[span] = base.verdict
+            entries = [(value, base.verdict) for value, _ in seeded]
+            pivot = index
+        elif index != pivot:
+            break
+        if rule.verdict != base.verdict and (
+                base.statements or base.verdict not in MAP_VERDICTS or rule.verdict not in MAP_VERDICTS):
+            break
+        candidates = _candidates(rule.matches[pivot])
+        if candidates is None:
+            break
+        found = [spans.find(span) for _, span in candidates]
+        if 'overlap' in found:
+            break
+        # A duplicate is decided by the earlier rule only if that rule ends
+        # evaluation; otherwise this rule still sees the packet.
+        if any(outcome == 'duplicate' and not _terminal(decided[span])
+               for (_, span), outcome in zip(candidates, found)):
+            break
+        for (value, span), outcome in zip(candidates, found):
+            if outcome == 'new':
+                spans.add(span)
+                decided[span] = rule.verdict
+                entries.append((value, rule.verdict))
+        names.append(rule.remark)
+        end += 1
+
+    if end == start + 1:
+        return end, base
+    if pivot is None:
+        return end, Rule(base.matches, base.statements, base.verdict, base.comment, _remark(names))
+    key = base.matches[pivot].key
+    if len(set(verdict for _, verdict in entries)) == 1:
+        values = tuple(value for value, _ in entries)
+        matches = list(base.matches)
+        matches[pivot] = Match(key, values if len(values) > 1 else values[0])
+        return end, Rule(matches, base.statements, base.verdict, base.comment, _remark(names))
+    common = [m for i, m in enumerate(base.matches) if i != pivot]
+    return end, Rule(common, comment=base.comment, remark=_remark(names), vmap=(key, entries))
+
+
+def _family(rule):
+    for match in rule.matches:
+        if match.key.startswith('ip '):
+            return 4
+        if match.key.startswith('ip6 '):
+            return 6
+    return None
+
+
+def group_families(rules):
+    """Stable-partition runs of family specific rules, IPv4 before IPv6.
+
+    An IPv4 rule never matches an IPv6 packet and vice versa, so swapping
+    them is safe; rules without a family match stay where they are.
+    """
+    grouped = []
+    run = []
+    for rule in rules:
+        if _family(rule) is None:
+            grouped.extend(r for r in run if _family(r) == 4)
+            grouped.extend(r for r in run if _family(r) == 6)
+            grouped.append(rule)
+            run = []
+        else:
+            run.append(rule)
+    grouped.extend(r for r in run if _family(r) == 4)
+    grouped.extend(r for r in run if _family(r) == 6)
+    return grouped
+
+
+def aggregate(rules):
+    """Fold consecutive compatible rules; return ``(rules, removed)``."""
+    folded = []
+    start = 0
+    while start < len(rules):
+        end, rule = _fold_run(rules, start)
+        folded.append(rule)
+        start = end
+    return folded, len(rules) - len(folded)
+
+
+def _protocol(rule):
+    for match in rule.matches:
+        protocol = match.key.split(' ', 1)[0]
+        if protocol in ('tcp', 'udp', 'sctp', 'dccp', 'udplite'):
+            return protocol
+    return None
+
+
+def _value_matches(rule):
+    """Matches including the implicit membership test of a verdict map."""
+    matches = list(rule.matches)
+    if rule.vmap:
+        key, entries = rule.vmap
+        matches.append(Match(key, tuple(value for value, _ in entries)))
+    return matches
+
+
+def _disjoint(a, b):
+    """True when no packet can match both rules."""
+    for left, right in ((_family(a), _family(b)), (_protocol(a), _protocol(b))):
+        if left and right and left != right:
+            return True
+    others = dict((m.key, m) for m in _value_matches(b))
+    for match in _value_matches(a):
+        peer = others.get(match.key)
+        if peer is None:
+            continue
+        left, right = _candidates(match), _candidates(peer)
+        if left is None or right is None:
+            continue
+        spans = _Spans()
+        for _, span in left:
+            spans.add(span)
+        if all(spans.find(span) == 'new' for _, span in right):
+            return True
+    return False
+
+
+def _commute(a, b):
+    if a.vmap is None and b.vmap is None and a.verdict == b.verdict and a.statements == b.statements:
+        return True
+    return _disjoint(a, b)
+
+
+def _average_depth(counts, order):
+    total = sum(counts)
+    if not total:
+        return 0.0
+    return sum(counts[index] * (position + 1) for position, index in enumerate(order)) / float(total)
+
+
+def reorder(rules, hits):
+    """Move hot rules forward past commutable colder ones.
+
+    ``hits`` maps rendered rule text to packet counts. Each move swaps two
+    adjacent rules that commute, so the verdict of every packet is
+    unchanged. Returns ``(rules, report)``; the report gives the expected
+    average number of these rules evaluated per matching packet before and
+    after.
+    """
+    counts = [int(hits.get(rule.render(), 0)) for rule in rules]
+    order = list(range(len(rules)))
+    for i in range(1, len(order)):
+        j = i
+        while j > 0 and counts[order[j - 1]] < counts[order[j]] and _commute(rules[order[j - 1]], rules[order[j]]):
+            order[j - 1], order[j] = order[j], order[j - 1]
+            j -= 1
+    before = _average_depth(counts, range(len(rules)))
+    after = _average_depth(counts, order)
+    report = {
+        'packets': sum(counts),
+        'rules_moved': sum(1 for position, index in enumerate(order) if position != index),
+        'avg_rules_before': round(before, 2),
+        'avg_rules_after': round(after, 2),
+        'reduction_pct': round(100.0 * (before - after) / before, 1) if before else 0.0,
+    }
+    return [rules[index] for index in order], report
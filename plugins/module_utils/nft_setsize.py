@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Choose set hints and estimate the kernel memory of a set.
+
+The kernel picks a set backend from the declared flags, ``size`` and
+``policy`` when the set is created, before any element is added:
+
+* exact keys of at most 16 bits can use ``bitmap`` (fixed size, the
+  cheapest under ``policy memory``);
+* other exact keys use the fixed-size ``hash`` when ``size`` is declared,
+  and the resizable ``rhash`` otherwise (also for dynamic sets);
+* single-field intervals use ``rbtree``, two elements per interval;
+* concatenated intervals use ``pipapo``, whose lookup tables grow with the
+  number of elements times the key bits.
+
+``hints()`` returns the ``(interval, size, policy)`` to declare for a static
+set of a known number of elements, ``estimate()`` mirrors the kernel's
+choice for a declared set and returns the backend with its approximate
+memory. The byte counts follow the 64-bit element layouts rounded to slab
+sizes; they are for capacity planning, not accounting.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+POLICIES = ('performance', 'memory')
+
+# Key bytes of the set types the compiler declares; concatenations add up
+# their fields, each padded to a 32-bit register.
+KEY_BYTES = {
+    'ipv4_addr': 4,
+    'ipv6_addr': 16,
+    'inet_service': 2,
+    'inet_proto': 1,
+    'ether_addr': 6,
+    'ifname': 16,
+    'mark': 4,
+}
+
+# Fixed-size sets get room to double before an update needs a new size.
+SIZE_HEADROOM = 2
+MIN_SIZE = 64
+
+# ``policy memory`` is declared once the chosen backend would hold at least
+# this much and the memory policy picks a smaller one.
+MEMORY_POLICY_BYTES = 1 << 20
+
+# struct nft_set with its name and hooks.
+SET_BYTES = 512
+
+# Lookup and space complexity classes, as the kernel orders them.
+O_1, O_LOG_N, O_N = range(3)
+
+
+def _fields(set_type):
+    return [field.strip() for field in set_type.split(' . ')]
+
+
+def _key_bytes(set_type):
+    fields = _fields(set_type)
+    if len(fields) == 1:
+        return KEY_BYTES.get(fields[0], 16)
+    return sum(-(-KEY_BYTES.get(field, 16) // 4) * 4 for field in fields)
+
+
+def _slab(size):
+    """Bytes kmalloc hands out for an object of ``size`` bytes."""
+    for bucket in (8, 16, 32, 64, 96, 128, 192, 256):
+        if size <= bucket:
+            return bucket
+    return 1 << (size - 1).bit_length()
+
+
+def _pow2(value):
+    return 1 << max(int(value) - 1, 0).bit_length()
+
+
+def _element(linkage, set_type):
+    # Backend linkage, the nft_set_ext header and the key, padded to 8.
+    return _slab(linkage + 8 + -(-_key_bytes(set_type) // 8) * 8)
+
+
+def _candidates(set_type, flags, size, count):
+    """Yield ``(backend, lookup, space, bytes)`` for every backend the kernel
+    would accept for this declaration."""
+    fields = _fields(set_type)
+    dynamic = 'dynamic' in flags or 'timeout' in flags
+    if 'interval' in flags:
+        if len(fields) == 1:
+            yield 'rbtree', O_LOG_N, O_N, 2 * count * _element(24, set_type)
+        else:
+            # Per field, one lookup table of 16 buckets per 4 key bits with a
+            # bit per element, and a mapping entry per element; both are
+            # cloned while a transaction updates the set.
+            words = -(-count // 64)
+            tables = sum(2 * -(-KEY_BYTES.get(field, 16) // 4) * 4 * 16 * words * 8 + count * 16
+                         for field in fields)
+            yield 'pipapo', O_LOG_N, O_N, 2 * tables + count * _element(0, set_type)
+        return
+    if _key_bytes(set_type) <= 2 and not dynamic:
+        yield 'bitmap', O_1, O_1, (1 << (8 * _key_bytes(set_type))) * 2 // 8 + count * _element(16, set_type)
+    if size and not dynamic:
+        yield 'hash', O_1, O_N, _pow2(size * 4 // 3) * 8 + count * _element(16, set_type)
+    yield 'rhash', O_1, O_N, _pow2(max(count * 4 // 3, 16)) * 8 + count * _element(8, set_type)
+
+
+def _select(candidates, policy):
+    # rhash estimates no size, so the kernel ranks it after any backend of
+    # the same class.
+    if policy == 'memory':
+        return min(candidates, key=lambda c: (c[2], c[0] == 'rhash', c[3]))
+    return min(candidates, key=lambda c: (c[1], c[0] == 'rhash', c[3]))
+
+
+def estimate(set_type, flags, size, policy, count):
+    """Return ``(backend, bytes)`` the kernel is expected to use for a set
+    of ``count`` elements declared with ``flags``, ``size`` and ``policy``."""
+    backend, _, _, total = _select(list(_candidates(set_type, flags, size, count)), policy or 'performance')
+    return backend, SET_BYTES + total
+
+
+def hints(set_type, elements, override=None):
+    """Return ``(interval, size, policy)`` to declare a static set holding
+    ``elements``.
+
+    ``interval`` is needed only when an element is a prefix or a range;
+    exact sets get a power-of-two ``size`` with room for updates, so the
+    kernel can use a fixed-size hash or bitmap. ``override`` may set any of
+    ``interval``, ``size`` and ``policy``; raises ``ValueError`` when it
+    contradicts the elements.
+    """
+    override = override or {}
+    unknown = sorted(set(override) - set(('interval', 'size', 'policy')))
+    if unknown:
+        raise ValueError('unsupported set hints: %s' % ', '.join(unknown))
+    count = len(elements)
+    needed = any('/' in str(e) or '-' in str(e) for e in elements)
+    interval = bool(override.get('interval', needed or not count))
+    if needed and not interval:
+        raise ValueError('interval: false but the set holds prefixes or ranges')
+    flags = ['interval'] if interval else []
+
+    size = override.get('size')
+    if size is not None:
+        if not isinstance(size, int) or isinstance(size, bool) or size < count:
+            raise ValueError('size must be an integer of at least %d, the number of elements' % count)
+    elif not interval:
+        size = _pow2(max(count * SIZE_HEADROOM, MIN_SIZE))
+
+    policy = override.get('policy')
+    if policy is not None and policy not in POLICIES:
+        raise ValueError("policy must be %s" % ' or '.join(POLICIES))
+    if policy is None:
+        fast = _select(list(_candidates(set_type, flags, size, count)), 'performance')
+        small = _select(list(_candidates(set_type, flags, size, count)), 'memory')
+        policy = 'memory' if fast[3] >= MEMORY_POLICY_BYTES and small[3] < fast[3] else 'performance'
+    return interval, size, policy
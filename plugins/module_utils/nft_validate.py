@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+"""Offline validation of rendered rulesets on the controller.
+
+Each ruleset is checked with ``nft -c -f`` inside a fresh unprivileged user
+and network namespace (``unshare --user --map-root-user --net``), so no root
+is needed and the controller's own ruleset is never consulted. Distinct
+rulesets are validated concurrently, one ``nft`` process per CPU, and the
+outcome is cached by a hash of the nft version and the ruleset text.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import hashlib
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ValidationError(Exception):
+    """The validator itself cannot run (missing nft, no user namespaces)."""
+
+
+def _run(argv):
+    proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    out, err = proc.communicate()
+    return proc.returncode, out, err
+
+
+class Validator(object):
+    """Validate many rulesets in parallel with a content-hash result cache."""
+
+    def __init__(self, nft='nft', sandbox=True, cache_dir=None, jobs=None):
+        self.nft = nft
+        self.sandbox = sandbox
+        self.cache_dir = cache_dir
+        self.jobs = jobs or os.cpu_count() or 1
+        self._version = None
+
+    def version(self):
+        if self._version is None:
+            try:
+                rc, out, err = _run([self.nft, '--version'])
+            except OSError as e:
+                raise ValidationError('cannot run %s: %s' % (self.nft, e))
+            if rc != 0:
+                raise ValidationError('%s --version failed: %s' % (self.nft, err.strip()))
+            self._version = out.strip()
+        return self._version
+
+    def argv(self, path, devices=()):
+        """Command checking ``path``; in the sandbox, dummy ``devices`` are
+        created first so flowtables and netdev chains can bind to them.
+        """
+        check = [self.nft, '-c', '-f', path]
+        if not self.sandbox:
+            return check
+        if devices:
+            # Fall back to veth where the dummy driver is not available.
+            script = ('i=0; for d; do i=$((i+1)); ip link add "$d" type dummy 2>/dev/null'
+                      ' || ip link add "$d" type veth peer name "nftv$i" || exit 1; done;'
+                      ' exec "$0" -c -f "%s"' % path)
+            check = ['sh', '-c', script, self.nft] + list(devices)
+        return ['unshare', '--user', '--map-root-user', '--net', '--'] + check
+
+    def key(self, text):
+        return hashlib.sha256((self.version() + '\0' + text).encode('utf-8')).hexdigest()
+
+    def _cached(self, key):
+        if not self.cache_dir:
+            return None
+        base = os.path.join(self.cache_dir, key)
+        if os.path.exists(base + '.ok'):
+            return True, ''
+        try:
+            with open(base + '.err') as f:
+                return False, f.read()
+        except (IOError, OSError):
+            return None
+
+    def _store(self, key, outcome):
+        if not self.cache_dir:
+            return
+        ok, message = outcome
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(message)
+        os.rename(tmp, os.path.join(self.cache_dir, key + ('.ok' if ok else '.err')))
+
+    def check(self, text, devices=()):
+        """Validate one ruleset; return ``(ok, error message)``."""
+        fd, path = tempfile.mkstemp(suffix='.nft')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            argv = self.argv(path, devices)
+            try:
+                rc, out, err = _run(argv)
+            except OSError as e:
+                raise ValidationError('cannot run %s: %s' % (argv[0], e))
+        finally:
+            os.unlink(path)
+        if rc != 0 and self.sandbox and 'unshare' in err and 'Operation not permitted' in err:
+            raise ValidationError('unprivileged user namespaces are unavailable: %s' % err.strip())
+        return rc == 0, err.strip()
+
+    def validate(self, texts, devices=None):
+        """Validate ``{name: text}``; return ``({name: (ok, message)}, cache_hits)``.
+
+        ``devices`` optionally maps a name to the interfaces its ruleset
+        references.
+        """
+        devices = devices or {}
+        if self.cache_dir and not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, 0o700)
+        outcomes = {}
+        pending = {}
+        hits = 0
+        for name, text in texts.items():
+            key = self.key(text)
+            cached = self._cached(key)
+            if cached is None:
+                pending[name] = (key, text)
+            else:
+                outcomes[name] = cached
+                hits += 1
+        # Each check is its own nft process; threads only wait on them.
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = dict((name, pool.submit(self.check, text, devices.get(name, ())))
+                           for name, (key, text) in pending.items())
+            for name, future in futures.items():
+                outcomes[name] = future.result()
+                self._store(pending[name][0], outcomes[name])
+        return outcomes, hits
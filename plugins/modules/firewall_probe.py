@@ -0,0 +1,188 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: firewall_probe
+short_description: Detect the host firewall backend without gathering facts
+description:
+  - Detects nftables, iptables-legacy, iptables-nft and firewalld from the
+    installed binaries and kernel state (C(/proc), C(/sys/module)), without
+    package facts or a package manager query.
+  - Runs no subprocesses and typically finishes in a few milliseconds.
+  - Stores the result as a local fact so later plays that gather facts see
+    it as C(ansible_local.firewall).
+options:
+  fact_path:
+    description: Local fact file to write. Set to an empty string to skip caching.
+    type: path
+    default: /etc/ansible/facts.d/firewall.fact
+author:
+  - Thomas Vincent
+'''
+
+EXAMPLES = r'''
+- name: Probe firewall backend
+  thomasvincent.firewall.firewall_probe:
+  register: probe
+
+- name: Use the detected backend
+  ansible.builtin.debug:
+    msg: "{{ probe.backend }}"
+'''
+
+RETURN = r'''
+backend:
+  description: Recommended backend - C(firewalld), C(nftables) or C(iptables).
+  returned: always
+  type: str
+probe:
+  description: Raw findings the recommendation is based on.
+  returned: always
+  type: dict
+  sample:
+    nft: /usr/sbin/nft
+    iptables: /usr/sbin/iptables
+    iptables_variant: nft
+    iptables_legacy_tables: false
+    nf_tables_loaded: true
+    firewalld: null
+    firewalld_running: false
+    duration_ms: 1.2
+ansible_facts:
+  description: C(firewall_probe), the same data as C(probe) plus C(backend).
+  returned: always
+  type: dict
+'''
+
+import json
+import os
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+
+SEARCH_PATH = ('/usr/sbin', '/usr/bin', '/sbin', '/bin', '/usr/local/sbin')
+
+
+def which(name):
+    for directory in SEARCH_PATH:
+        candidate = os.path.join(directory, name)
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+
+def iptables_variant(path):
+    """Classify the iptables binary by what its symlink chain resolves to."""
+    if not path:
+        return None
+    target = os.path.basename(os.path.realpath(path))
+    if 'legacy' in target:
+        return 'legacy'
+    if 'nft' in target:
+        return 'nft'
+    return 'legacy'
+
+
+def legacy_tables_in_use():
+    """True when the x_tables kernel side has legacy tables registered."""
+    for name in ('/proc/net/ip_tables_names', '/proc/net/ip6_tables_names'):
+        try:
+            with open(name) as f:
+                if f.read().strip():
+                    return True
+        except (IOError, OSError):
+            continue
+    return False
+
+
+def firewalld_running():
+    for pidfile in ('/run/firewalld.pid', '/var/run/firewalld.pid'):
+        try:
+            with open(pidfile) as f:
+                if os.path.isdir('/proc/%s' % f.read().strip()):
+                    return True
+        except (IOError, OSError):
+            continue
+    try:
+        pids = [p for p in os.listdir('/proc') if p.isdigit()]
+    except OSError:
+        return False
+    for pid in pids:
+        try:
+            with open('/proc/%s/comm' % pid) as f:
+                if f.read().strip() == 'firewalld':
+                    return True
+        except (IOError, OSError):
+            continue
+    return False
+
+
+def probe():
+    iptables = which('iptables')
+    firewalld = which('firewalld')
+    return {
+        'nft': which('nft'),
+        'iptables': iptables,
+        'iptables_variant': iptables_variant(iptables),
+        'iptables_legacy_tables': legacy_tables_in_use(),
+        'nf_tables_loaded': os.path.isdir('/sys/module/nf_tables'),
+        'firewalld': firewalld,
+        'firewalld_running': bool(firewalld) and firewalld_running(),
+    }
+
+
+def recommend(found):
+    if found['firewalld_running']:
+        return 'firewalld'
+    # Legacy x_tables rules in use mean nftables would run alongside them.
+    if found['iptables_variant'] == 'legacy' and found['iptables_legacy_tables']:
+        return 'iptables'
+    if found['nft'] or found['nf_tables_loaded'] or not found['iptables']:
+        return 'nftables'
+    return 'iptables'
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            fact_path=dict(type='path', default='/etc/ansible/facts.d/firewall.fact'),
+        ),
+        supports_check_mode=True,
+    )
+    start = time.time()
+    found = probe()
+    backend = recommend(found)
+    found['duration_ms'] = round((time.time() - start) * 1000.0, 1)
+
+    changed = False
+    fact = dict(found, backend=backend)
+    fact_path = module.params['fact_path']
+    if fact_path:
+        cached = dict((k, v) for k, v in fact.items() if k != 'duration_ms')
+        try:
+            with open(fact_path) as f:
+                changed = json.load(f) != cached
+        except (IOError, OSError, ValueError):
+            changed = True
+        if changed and not module.check_mode:
+            directory = os.path.dirname(fact_path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory, 0o755)
+            tmp = os.path.join(module.tmpdir, 'firewall.fact')
+            with open(tmp, 'w') as f:
+                json.dump(cached, f, indent=2, sort_keys=True)
+            os.chmod(tmp, 0o644)
+            module.atomic_move(tmp, fact_path)
+
+    module.exit_json(changed=changed, backend=backend, probe=found, ansible_facts={'firewall_probe': fact})
+
+
+if __name__ == '__main__':
+    main()
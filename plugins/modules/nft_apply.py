@@ -0,0 +1,460 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: nft_apply
+short_description: Back up, validate, apply and roll back an nftables ruleset in one step
+description:
+  - Runs the whole apply pipeline on the target in a single module
+    execution - C(nft -c) validation of the new ruleset, backup of the
+    current config, atomic write of the config file, load, and rollback to
+    the previous config if the load fails.
+  - In C(full) mode, the config file is loaded with C(nft -f).
+  - In C(incremental) mode, diffs the desired IR from the
+    C(thomasvincent.firewall.nft_compile) filter against the IR applied last
+    time and the live ruleset (C(nft -j -t list ruleset)), then commits only
+    the changed rules and set elements as a single atomic C(nft -f) batch.
+  - A set with more than C(shadow_threshold) changed elements is rebuilt
+    instead of being changed inside that batch. A shadow copy is declared
+    and filled by separate transactions of at most 65536 elements while the
+    old set keeps serving packets, and the final batch only points the rules
+    at the shadow and deletes the old set. The shadow name (C(SET_b), or
+    C(SET) again on the next rebuild) is kept in C(state_path).
+  - Structural changes (tables, chains, set declarations), drift in the live
+    ruleset or a missing baseline fall back to a full load.
+  - When C(fingerprint) matches the one stored by the last successful apply,
+    the module returns unchanged before validation, backup or load.
+  - The kernel ruleset is loaded at most once per call. A load is a single
+    netlink transaction, so a failed load leaves the previous ruleset in
+    place and rollback only restores the previous config file.
+options:
+  path:
+    description: Ruleset config file to write and load.
+    type: path
+    required: true
+  content:
+    description:
+      - Complete ruleset text. Written to C(path) after validation.
+      - When omitted, the existing C(path) is validated and loaded as is.
+    type: str
+  backup:
+    description:
+      - Keep a timestamped copy of the previous C(path) next to it.
+      - Taken after validation, and only when the ruleset is about to be
+        loaded.
+    type: bool
+    default: true
+  validate_only:
+    description: Only validate C(content); write and load nothing.
+    type: bool
+    default: false
+  mode:
+    description: How to apply the ruleset.
+    type: str
+    choices: [full, incremental]
+    default: full
+  ir:
+    description:
+      - Desired IR, the C(ir) key returned by C(nft_compile(ir=true)).
+      - Required in C(incremental) mode. When omitted, the stored baseline is
+        removed so a later incremental run starts with a full load.
+    type: dict
+  shadow_threshold:
+    description:
+      - Changed elements above which a set is rebuilt through a shadow set in
+        C(incremental) mode. 0 changes every set in place.
+    type: int
+    default: 0
+  state_path:
+    description: Where the applied IR is stored as the next run's baseline.
+    type: path
+    default: /var/lib/ansible-firewall/nftables.json
+  fingerprint:
+    description:
+      - Fingerprint of the desired ruleset, the C(fingerprint) key returned by
+        C(nft_compile). Stored in C(fingerprint_path) after a successful apply.
+    type: str
+  fingerprint_path:
+    description: File holding the fingerprints of the last successful apply.
+    type: path
+    default: /var/lib/ansible-firewall/nftables.fingerprint
+  service:
+    description:
+      - Name of the nftables systemd unit. When the unit is not active and
+        its C(ExecStart) loads C(path), the ruleset is loaded by starting it
+        instead of running C(nft -f), so enabling the service afterwards
+        does not load the ruleset again.
+      - When the unit loads another file (EL loads
+        C(/etc/sysconfig/nftables.conf)), the ruleset is loaded with
+        C(nft -f) and the unit is only enabled.
+    type: str
+  verify_live:
+    description:
+      - Also fingerprint C(nft list ruleset) after applying, and require the
+        live ruleset to still match before short-circuiting.
+      - Detects out-of-band changes at the cost of listing the full ruleset.
+    type: bool
+    default: false
+author:
+  - Thomas Vincent
+'''
+
+EXAMPLES = r'''
+- name: Validate, apply and roll back on failure in one round trip
+  thomasvincent.firewall.nft_apply:
+    path: /etc/nftables.conf
+    content: "{{ lookup('ansible.builtin.template', 'nftables.conf.j2') }}"
+
+- name: Apply only the changed rules and set elements
+  thomasvincent.firewall.nft_apply:
+    path: /etc/nftables.conf
+    content: "{{ lookup('ansible.builtin.template', 'nftables.conf.j2') }}"
+    mode: incremental
+    ir: "{{ nftables_compiled.ir }}"
+    shadow_threshold: 10000
+'''
+
+RETURN = r'''
+mode:
+  description: Mode actually used; C(full) when an incremental apply fell back.
+  returned: always
+  type: str
+reason:
+  description: Why an incremental apply fell back to a full load.
+  returned: always
+  type: str
+commands:
+  description: Number of commands in the delta transactions.
+  returned: always
+  type: int
+delta:
+  description: Rules added/deleted/replaced, set elements added/deleted, sets swapped and elements filled into shadows.
+  returned: always
+  type: dict
+batches:
+  description:
+    - Kernel transactions run, in order, with their C(kind) (C(fill),
+      C(commit), C(nft) or C(service)), command and element counts and
+      milliseconds.
+    - The last one is the stall window, the only transaction that changes
+      what packets see.
+  returned: always
+  type: list
+  elements: dict
+  sample: [{kind: fill, commands: 17, elements: 65536, ms: 212.3}, {kind: commit, commands: 2, elements: 0, ms: 3.1}]
+backup_file:
+  description: Copy of the previous config, when one was taken.
+  returned: when a backup was written
+  type: str
+apply_count:
+  description: Number of times the kernel ruleset was loaded (0 or 1).
+  returned: always
+  type: int
+loaded_by:
+  description: How the ruleset was loaded - C(nft), C(delta), C(service), or null when nothing was loaded.
+  returned: always
+  type: str
+unit_loads_path:
+  description:
+    - Whether the inactive C(service) unit loads C(path) when started; null
+      when the unit was active or not checked. When false the unit was only
+      enabled, and starting it would load a different file.
+  returned: always
+  type: bool
+fingerprint_match:
+  description: Whether the stored fingerprints matched and nothing else ran.
+  returned: always
+  type: bool
+rolled_back:
+  description: Whether the previous config file was restored after a failed load.
+  returned: always
+  type: bool
+timings:
+  description: Milliseconds spent in each phase that ran (validate, backup, write, apply, rollback).
+  returned: always
+  type: dict
+  sample: {validate: 38.2, backup: 0.4, write: 0.6, apply: 41.0}
+'''
+
+import hashlib
+import json
+import os
+import re
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_bytes
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_delta import (
+    FullReload,
+    parse_live,
+    plan,
+)
+
+
+class Phases(object):
+    """Accumulate per-phase wall-clock timings in milliseconds."""
+
+    def __init__(self):
+        self.timings = {}
+        self._name = None
+        self._start = None
+
+    def start(self, name):
+        self.stop()
+        self._name = name
+        self._start = time.time()
+
+    def stop(self):
+        if self._name is not None:
+            elapsed = (time.time() - self._start) * 1000.0
+            self.timings[self._name] = round(self.timings.get(self._name, 0.0) + elapsed, 1)
+            self._name = None
+
+
+def load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def save_json(module, path, data):
+    """Atomically write ``data`` to ``path``; None removes the file."""
+    if data is None:
+        if os.path.exists(path):
+            os.unlink(path)
+        return
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+    tmp = os.path.join(module.tmpdir, os.path.basename(path))
+    with open(tmp, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    module.atomic_move(tmp, path)
+
+
+def live_fingerprint(module, nft):
+    rc, out, err = module.run_command([nft, 'list', 'ruleset'])
+    if rc != 0:
+        return None
+    return hashlib.sha256(to_bytes(out)).hexdigest()
+
+
+def read_file(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def write_file(module, path, data):
+    tmp = os.path.join(module.tmpdir, 'nftables.conf')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp, 0o600)
+    module.atomic_move(tmp, path)
+
+
+def live_ruleset(module, nft):
+    rc, out, err = module.run_command([nft, '-j', '-t', 'list', 'ruleset'])
+    if rc != 0:
+        raise FullReload('cannot read live ruleset: %s' % err.strip())
+    try:
+        return parse_live(json.loads(out))
+    except (ValueError, KeyError, TypeError) as e:
+        raise FullReload('cannot parse live ruleset: %s' % e)
+
+
+def service_inactive(module, service):
+    """Return the systemctl path when ``service`` is known and not active."""
+    systemctl = module.get_bin_path('systemctl')
+    if not systemctl:
+        return None
+    rc, out, err = module.run_command([systemctl, 'is-active', service])
+    return systemctl if out.strip() != 'active' else None
+
+
+def unit_loads(module, systemctl, service, path):
+    """Whether starting ``service`` runs a command that loads ``path``."""
+    rc, out, err = module.run_command([systemctl, 'show', '-p', 'ExecStart', service])
+    return rc == 0 and re.search(r'(?:^|[\s=])%s(?:[\s;]|$)' % re.escape(path), out) is not None
+
+
+def drop_shadows(module, nft, filled):
+    """Delete the shadow sets a failed delta left declared, best effort."""
+    for ref in sorted(set(filled)):
+        module.run_command([nft, 'delete', 'set'] + ref.split())
+
+
+def run_batch(module, nft, commands):
+    batch = os.path.join(module.tmpdir, 'nft-delta.nft')
+    with open(batch, 'w') as f:
+        f.write('\n'.join(commands))
+        f.write('\n')
+    return module.run_command([nft, '-f', batch])
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            path=dict(type='path', required=True),
+            content=dict(type='str'),
+            backup=dict(type='bool', default=True),
+            validate_only=dict(type='bool', default=False),
+            mode=dict(type='str', default='full', choices=['full', 'incremental']),
+            ir=dict(type='dict'),
+            state_path=dict(type='path', default='/var/lib/ansible-firewall/nftables.json'),
+            shadow_threshold=dict(type='int', default=0),
+            fingerprint=dict(type='str'),
+            fingerprint_path=dict(type='path', default='/var/lib/ansible-firewall/nftables.fingerprint'),
+            verify_live=dict(type='bool', default=False),
+            service=dict(type='str'),
+        ),
+        required_if=[('mode', 'incremental', ('ir',))],
+        supports_check_mode=True,
+    )
+    params = module.params
+    path = params['path']
+    nft = module.get_bin_path('nft', required=True)
+    phases = Phases()
+    result = dict(changed=False, mode=params['mode'], reason=None, commands=0, delta={}, batches=[],
+                  apply_count=0, loaded_by=None, unit_loads_path=None, fingerprint_match=False, rolled_back=False,
+                  timings=phases.timings)
+
+    def fail(msg, **kwargs):
+        phases.stop()
+        result.update(kwargs)
+        module.fail_json(msg=msg, **result)
+
+    if params['fingerprint']:
+        phases.start('fingerprint')
+        stored = load_json(params['fingerprint_path']) or {}
+        if stored.get('ruleset') == params['fingerprint'] and (
+                not params['verify_live'] or stored.get('live') == live_fingerprint(module, nft)):
+            result['fingerprint_match'] = True
+            phases.stop()
+            module.exit_json(**result)
+
+    phases.start('validate')
+    previous = read_file(path)
+    desired = previous if params['content'] is None else to_bytes(params['content'])
+    if desired is None:
+        fail('%s does not exist and no content was given' % path)
+    staged = os.path.join(module.tmpdir, 'nftables.staged')
+    with open(staged, 'wb') as f:
+        f.write(desired)
+    rc, out, err = module.run_command([nft, '-c', '-f', staged])
+    if rc != 0:
+        fail('Validation failed; nothing was changed', stderr=err, rc=rc)
+    if params['validate_only']:
+        phases.stop()
+        module.exit_json(**result)
+
+    batches = None
+    state = params['ir']
+    if params['mode'] == 'incremental':
+        try:
+            live = live_ruleset(module, nft)
+            batches, result['delta'], state = plan(load_json(params['state_path']), params['ir'], live,
+                                                   params['shadow_threshold'])
+        except FullReload as e:
+            result.update(mode='full', reason=str(e))
+        else:
+            result['commands'] = sum(len(batch['commands']) for batch in batches)
+    result['changed'] = desired != previous or batches is None or bool(batches)
+    if module.check_mode:
+        phases.stop()
+        module.exit_json(**result)
+
+    phases.start('apply')
+    systemctl = service_inactive(module, params['service']) if params['service'] else None
+    enable = None
+    if systemctl:
+        result['unit_loads_path'] = unit_loads(module, systemctl, params['service'], path)
+        if not result['unit_loads_path']:
+            # Starting this unit would load some other file; load ours and
+            # leave the unit stopped.
+            enable, systemctl = systemctl, None
+    if systemctl:
+        # Starting the unit runs nft -f itself; loading first would make
+        # that a second load.
+        if batches is not None:
+            result.update(mode='full', reason='%s was not active' % params['service'])
+            state = params['ir']
+        batches = [{'kind': 'service', 'argv': [systemctl, 'start', params['service']]}]
+        result['loaded_by'] = 'service'
+    elif batches is None:
+        batches = [{'kind': 'nft', 'argv': [nft, '-f', path]}]
+        result['loaded_by'] = 'nft'
+    elif batches:
+        result['loaded_by'] = 'delta'
+
+    if params['backup'] and previous is not None and batches:
+        phases.start('backup')
+        result['backup_file'] = '%s.backup-%d' % (path, int(time.time()))
+        write_file(module, result['backup_file'], previous)
+
+    if desired != previous:
+        phases.start('write')
+        write_file(module, path, desired)
+
+    phases.start('apply')
+    rc, err = 0, ''
+    filled = []
+    for batch in batches:
+        began = time.time()
+        if 'argv' in batch:
+            rc, out, err = module.run_command(batch['argv'])
+        else:
+            rc, out, err = run_batch(module, nft, batch['commands'])
+        result['batches'].append({'kind': batch['kind'], 'commands': len(batch.get('commands', ())),
+                                  'elements': batch.get('elements', 0),
+                                  'ms': round((time.time() - began) * 1000.0, 1)})
+        if rc != 0:
+            break
+        if batch['kind'] == 'fill':
+            filled.append(batch['set'])
+    if rc != 0:
+        # The failed transaction never reached the kernel and the rules
+        # still use the old sets, so dropping any shadow sets and restoring
+        # the previous file is the whole rollback.
+        phases.start('rollback')
+        drop_shadows(module, nft, filled)
+        if previous is None:
+            os.unlink(path)
+        elif desired != previous:
+            write_file(module, path, previous)
+            result['rolled_back'] = True
+        save_json(module, params['state_path'], None)
+        save_json(module, params['fingerprint_path'], None)
+        fail('Failed to apply nftables config%s'
+             % ('. Rolled back to previous configuration.' if result['rolled_back'] else ''),
+             stderr=err, rc=rc)
+    if enable:
+        module.run_command([enable, 'enable', params['service']])
+    if result['loaded_by']:
+        result['apply_count'] = 1
+    if params['content'] is not None or params['ir'] is not None:
+        # Reloading the config file as is keeps the baseline valid.
+        save_json(module, params['state_path'], state)
+    if params['fingerprint']:
+        phases.start('fingerprint')
+        save_json(module, params['fingerprint_path'], {
+            'ruleset': params['fingerprint'],
+            'live': live_fingerprint(module, nft) if params['verify_live'] else None,
+        })
+    phases.stop()
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: nft_conntrack
+short_description: Size the connection tracking table and report its occupancy
+description:
+  - Reports the number of tracked connections, the table limit and the
+    hash bucket count from C(/proc/sys/net/netfilter) as the
+    C(firewall_conntrack_state) fact.
+  - With C(tune=true) also sets C(nf_conntrack_max), the hash buckets and
+    per-protocol timeouts at runtime and persists them, loading
+    C(nf_conntrack) first if needed.
+  - Unless C(max) is given, the limit is C(connection_rate) x
+    C(connection_lifetime) x C(headroom) entries, never below the kernel's
+    own default for the host memory and never using more than
+    C(memory_pct) percent of it (about 320 bytes per entry).
+options:
+  tune:
+    description: Apply the sizing and timeouts; otherwise only report.
+    type: bool
+    default: false
+  connection_rate:
+    description: Expected new connections per second at peak.
+    type: float
+    default: 0
+  connection_lifetime:
+    description: Average seconds a connection stays in the table.
+    type: float
+    default: 120
+  headroom:
+    description: Factor applied to the expected number of entries.
+    type: float
+    default: 2.0
+  memory_pct:
+    description: Most of the host memory, in percent, the table may use.
+    type: float
+    default: 5
+  entries_per_bucket:
+    description: Target average hash chain length; buckets are the limit divided by it.
+    type: int
+    default: 1
+  max:
+    description: Explicit C(nf_conntrack_max); overrides the computation.
+    type: int
+  buckets:
+    description: Explicit hash bucket count; overrides the computation.
+    type: int
+  timeouts:
+    description:
+      - Seconds per protocol state, keyed C(PROTO) or C(PROTO_STATE), for
+        example C(tcp_established) for C(nf_conntrack_tcp_timeout_established)
+        or C(udp) for C(nf_conntrack_udp_timeout).
+    type: dict
+    default: {}
+  sysctl_path:
+    description: sysctl.d file persisting the limit and timeouts. Set to an empty string to skip.
+    type: path
+    default: /etc/sysctl.d/90-firewall-conntrack.conf
+  modprobe_path:
+    description: modprobe.d file persisting the bucket count as the C(hashsize) option. Set to an empty string to skip.
+    type: path
+    default: /etc/modprobe.d/firewall-conntrack.conf
+  modules_load_path:
+    description:
+      - modules-load.d file loading C(nf_conntrack) at boot, before the
+        sysctl.d settings are applied. Set to an empty string to skip.
+    type: path
+    default: /etc/modules-load.d/firewall-conntrack.conf
+author:
+  - Thomas Vincent
+'''
+
+EXAMPLES = r'''
+- name: Size conntrack for 20k new connections per second
+  thomasvincent.firewall.nft_conntrack:
+    tune: true
+    connection_rate: 20000
+    connection_lifetime: 60
+    timeouts:
+      tcp_established: 3600
+      udp: 30
+
+- name: Report conntrack occupancy
+  thomasvincent.firewall.nft_conntrack:
+
+- name: Warn when the table is getting full
+  ansible.builtin.debug:
+    msg: "conntrack {{ firewall_conntrack_state.occupancy_pct }}% full"
+  when: firewall_conntrack_state.occupancy_pct > 75
+'''
+
+RETURN = r'''
+ansible_facts:
+  description: C(firewall_conntrack_state), the occupancy and sizing of the table.
+  returned: always
+  type: dict
+  sample:
+    firewall_conntrack_state:
+      loaded: true
+      count: 18234
+      max: 262144
+      buckets: 262144
+      occupancy_pct: 7.0
+      memory_bytes: 85983232
+      wanted: {max: 262144, buckets: 262144, capped: false}
+      timeouts: {tcp_established: 3600, udp: 30}
+'''
+
+import math
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+
+PROC = '/proc/sys/net/netfilter'
+HASHSIZE = '/sys/module/nf_conntrack/parameters/hashsize'
+ENTRY_BYTES = 320
+BUCKET_BYTES = 8
+
+
+def memory_total():
+    with open('/proc/meminfo') as f:
+        for line in f:
+            if line.startswith('MemTotal:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def kernel_default(memory):
+    """Bucket count (and limit) the kernel picks for ``memory`` bytes."""
+    if memory > 4 << 30:
+        return 262144
+    if memory > 1 << 30:
+        return 65536
+    return max(1024, memory // 16384 // 8)
+
+
+def size(memory, rate, lifetime, headroom, memory_pct, entries_per_bucket, maximum=None, buckets=None):
+    """Return ``(max, buckets, capped)`` for the table.
+
+    ``capped`` is true when the expected entries did not fit in the memory
+    budget.
+    """
+    capped = False
+    if maximum is None:
+        ceiling = int(memory * memory_pct / 100.0 / (ENTRY_BYTES + BUCKET_BYTES / float(entries_per_bucket)))
+        needed = int(math.ceil(rate * lifetime * headroom))
+        capped = needed > ceiling
+        maximum = max(kernel_default(memory), min(needed, ceiling))
+    if buckets is None:
+        buckets = int(math.ceil(maximum / float(entries_per_bucket)))
+    return maximum, buckets, capped
+
+
+def timeout_sysctl(key):
+    """``tcp_established`` -> ``nf_conntrack_tcp_timeout_established``."""
+    protocol, _, state = key.partition('_')
+    return 'nf_conntrack_%s_timeout%s' % (protocol, '_' + state if state else '')
+
+
+def read(path):
+    try:
+        with open(path) as f:
+            return int(f.read().split()[0])
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+
+
+def write(path, value):
+    with open(path, 'w') as f:
+        f.write('%d\n' % value)
+
+
+def persist(module, path, content):
+    """Write ``content`` to ``path`` unless it is already there; return whether it changed."""
+    if not path:
+        return False
+    try:
+        with open(path) as f:
+            if f.read() == content:
+                return False
+    except (IOError, OSError):
+        pass
+    if not module.check_mode:
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o755)
+        tmp = os.path.join(module.tmpdir, os.path.basename(path))
+        with open(tmp, 'w') as f:
+            f.write(content)
+        module.atomic_move(tmp, path)
+    return True
+
+
+def report(wanted=None, timeouts=None):
+    count = read(os.path.join(PROC, 'nf_conntrack_count'))
+    maximum = read(os.path.join(PROC, 'nf_conntrack_max'))
+    buckets = read(os.path.join(PROC, 'nf_conntrack_buckets'))
+    return {
+        'loaded': count is not None,
+        'count': count or 0,
+        'max': maximum or 0,
+        'buckets': buckets or 0,
+        'occupancy_pct': round(100.0 * count / maximum, 1) if count is not None and maximum else 0.0,
+        'memory_bytes': (maximum or 0) * ENTRY_BYTES + (buckets or 0) * BUCKET_BYTES,
+        'wanted': wanted,
+        'timeouts': timeouts or {},
+    }
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            tune=dict(type='bool', default=False),
+            connection_rate=dict(type='float', default=0),
+            connection_lifetime=dict(type='float', default=120),
+            headroom=dict(type='float', default=2.0),
+            memory_pct=dict(type='float', default=5),
+            entries_per_bucket=dict(type='int', default=1),
+            max=dict(type='int'),
+            buckets=dict(type='int'),
+            timeouts=dict(type='dict', default={}),
+            sysctl_path=dict(type='path', default='/etc/sysctl.d/90-firewall-conntrack.conf'),
+            modprobe_path=dict(type='path', default='/etc/modprobe.d/firewall-conntrack.conf'),
+            modules_load_path=dict(type='path', default='/etc/modules-load.d/firewall-conntrack.conf'),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    if not params['tune']:
+        module.exit_json(changed=False, ansible_facts={'firewall_conntrack_state': report()})
+    if params['entries_per_bucket'] < 1 or not 0 < params['memory_pct'] <= 100:
+        module.fail_json(msg='entries_per_bucket must be at least 1 and memory_pct within (0, 100]')
+
+    if not os.path.isdir(PROC):
+        modprobe = module.get_bin_path('modprobe', required=True)
+        rc, out, err = module.run_command([modprobe, 'nf_conntrack'])
+        if rc != 0 or not os.path.isdir(PROC):
+            module.fail_json(msg='cannot load nf_conntrack: %s' % err.strip())
+
+    maximum, buckets, capped = size(memory_total(), params['connection_rate'], params['connection_lifetime'],
+                                    params['headroom'], params['memory_pct'], params['entries_per_bucket'],
+                                    params['max'], params['buckets'])
+    timeouts = {}
+    for key, seconds in params['timeouts'].items():
+        name = timeout_sysctl(key)
+        if not os.path.exists(os.path.join(PROC, name)):
+            module.fail_json(msg="unknown conntrack timeout '%s' (no %s)" % (key, os.path.join(PROC, name)))
+        try:
+            timeouts[name] = int(seconds)
+        except (TypeError, ValueError):
+            module.fail_json(msg="conntrack timeout '%s' must be a number of seconds" % key)
+
+    # Resize the hash before raising the limit, so chains never grow long.
+    changed = False
+    settings = [('nf_conntrack_buckets', buckets), ('nf_conntrack_max', maximum)] + sorted(timeouts.items())
+    for name, value in settings:
+        path = os.path.join(PROC, name)
+        if name == 'nf_conntrack_buckets' and not os.access(path, os.W_OK):
+            path = HASHSIZE
+        if read(path) != value:
+            changed = True
+            if not module.check_mode:
+                try:
+                    write(path, value)
+                except (IOError, OSError) as e:
+                    module.fail_json(msg='cannot set %s: %s' % (name, e))
+
+    sysctl = ''.join('net.netfilter.%s = %d\n' % (name, value) for name, value in settings[1:])
+    changed |= persist(module, params['sysctl_path'], sysctl)
+    changed |= persist(module, params['modprobe_path'], 'options nf_conntrack hashsize=%d\n' % buckets)
+    changed |= persist(module, params['modules_load_path'], 'nf_conntrack\n')
+
+    wanted = {'max': maximum, 'buckets': buckets, 'capped': capped}
+    module.exit_json(changed=changed, ansible_facts={'firewall_conntrack_state': report(
+        wanted, dict((key, int(seconds)) for key, seconds in params['timeouts'].items()))})
+
+
+if __name__ == '__main__':
+    main()
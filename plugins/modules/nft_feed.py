@@ -0,0 +1,264 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: nft_feed
+short_description: Stream large address feeds into nftables interval sets
+description:
+  - Loads threat-intel feeds with millions of entries into the
+    C(SET_v4)/C(SET_v6) interval sets of a table, without passing them
+    through inventory variables or the ruleset template.
+  - On the controller the feed files are streamed (plain or CSV, gzip
+    detected automatically), deduplicated and merged into disjoint
+    intervals, and the result is cached by the files' paths, sizes and
+    modification times, so a play with many hosts merges each feed once.
+  - On the target the merged feed is compared with the one loaded last
+    time (C(state_path)) line by line, and only the differences are applied
+    in C(nft -f) transactions of at most about C(batch_bytes) each. Each
+    transaction deletes and adds the elements of one run of addresses, so a
+    replaced prefix is enforced throughout. Memory stays bounded on both
+    sides.
+  - When there is no usable record of the last load (first run, the table
+    or the sets were recreated by a full ruleset reload, or an earlier run
+    failed part way), the feed is compared with the elements the sets hold
+    instead. A recreated table is detected from its handle, which the kernel
+    never reuses, and the set handles.
+  - A failed transaction leaves the sets as they are, with the transactions
+    before it applied, and removes C(state_path) so the next run starts
+    from the sets' contents.
+  - The sets must be declared with C(flags interval) and without
+    C(auto-merge); C(firewall_blocklists) entries with C(feeds) are.
+  - This is an action plugin. C(sources) and C(cache_dir) are handled on
+    the controller, and the module it runs on the target takes the merged
+    feed as C(src).
+options:
+  sources:
+    description:
+      - Feed files on the controller. Each item is a path or a mapping with
+        C(path), C(format) (C(plain) or C(csv)), C(column) (index or header
+        name, default 0) and C(delimiter) (default C(,)).
+    type: list
+    elements: raw
+    required: true
+  family:
+    description: Table family.
+    type: str
+    default: netdev
+  table:
+    description: Table name.
+    type: str
+    default: blocklist
+  set:
+    description: Set name prefix; elements go to C(SET_v4) and C(SET_v6).
+    type: str
+    required: true
+  batch_bytes:
+    description:
+      - Element text per transaction. A transaction grows past it only
+        while the next change overlaps an interval it already holds.
+    type: int
+    default: 262144
+  state_path:
+    description: Feed loaded last time on the target. Defaults to a file per table and set under C(/var/lib/ansible-firewall/feeds).
+    type: path
+  cache_dir:
+    description: Controller directory for merged feeds. Defaults to Ansible's local tmp.
+    type: path
+  src:
+    description:
+      - Internal. The merged feed on the target, set by the action plugin;
+        not for direct use.
+    type: path
+author:
+  - Thomas Vincent
+'''
+
+EXAMPLES = r'''
+- name: Load the Spamhaus DROP list into the scanners blocklist
+  thomasvincent.firewall.nft_feed:
+    set: scanners_feed
+    sources:
+      - /srv/feeds/drop.txt
+      - path: /srv/feeds/intel.csv.gz
+        format: csv
+        column: network
+'''
+
+RETURN = r'''
+entries:
+  description: Feed entries read on the controller.
+  returned: always
+  type: int
+invalid:
+  description: Entries that were not addresses, prefixes or ranges and were skipped.
+  returned: always
+  type: int
+elements:
+  description: Elements after deduplication and merging.
+  returned: always
+  type: int
+added:
+  description: Elements added.
+  returned: always
+  type: int
+deleted:
+  description: Elements deleted.
+  returned: always
+  type: int
+batches:
+  description: C(nft -f) transactions run, each with the deletes and adds of one run of addresses.
+  returned: always
+  type: int
+reloaded:
+  description: Whether there was no usable record of the last load, so the feed was compared with the elements the sets hold.
+  returned: always
+  type: bool
+timings:
+  description: Milliseconds spent diffing and applying, and the slowest batch.
+  returned: always
+  type: dict
+  sample: {"apply": 812.4, "batch_max": 41.2}
+'''
+
+import gzip
+import json
+import os
+import shutil
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_feed import (
+    diff,
+    element_line,
+    lines,
+    transactions,
+)
+
+
+def _handle(module, nft, kind, argv):
+    rc, out, err = module.run_command([nft, '-j', '-t', 'list'] + argv)
+    if rc != 0:
+        module.fail_json(msg='%s is not loaded: %s' % (' '.join(argv), err.strip()))
+    try:
+        return [item[kind]['handle'] for item in json.loads(out)['nftables'] if kind in item][0]
+    except (ValueError, KeyError, IndexError):
+        module.fail_json(msg='cannot parse nft output', stdout=out)
+
+
+def set_handles(module, nft, family, table, prefix):
+    """Identity of the table and the two sets.
+
+    Set handles restart from 1 in a recreated table, so a ``flush ruleset``
+    reload gives the sets their old handles back; table handles come from a
+    counter the kernel never resets.
+    """
+    handles = [_handle(module, nft, 'table', ['table', family, table])]
+    for version in ('4', '6'):
+        handles.append(_handle(module, nft, 'set', ['set', family, table, '%s_v%s' % (prefix, version)]))
+    return '# table %s sets %s %s' % tuple(handles)
+
+
+def _element(value):
+    if isinstance(value, dict) and 'elem' in value:
+        value = value['elem']['val']
+    if isinstance(value, dict) and 'prefix' in value:
+        return '%s/%s' % (value['prefix']['addr'], value['prefix']['len'])
+    if isinstance(value, dict) and 'range' in value:
+        return '%s-%s' % tuple(value['range'])
+    return value
+
+
+def set_lines(module, nft, family, table, prefix):
+    """Sorted lines of the elements the two sets hold, for a diff against
+    the feed when the last load is unknown. Usually the sets are empty, as
+    a reload has just recreated them."""
+    found = []
+    for version in ('4', '6'):
+        name = '%s_v%s' % (prefix, version)
+        rc, out, err = module.run_command([nft, '-j', 'list', 'set', family, table, name])
+        if rc != 0:
+            module.fail_json(msg='set %s %s %s is not loaded: %s' % (family, table, name, err.strip()))
+        try:
+            elements = [item['set'].get('elem', []) for item in json.loads(out)['nftables'] if 'set' in item][0]
+            found.extend(element_line(_element(value)) for value in elements)
+        except (ValueError, KeyError, IndexError, TypeError):
+            module.fail_json(msg='cannot parse nft output', stdout=out)
+    return sorted(found)
+
+
+def stored_header(path):
+    try:
+        with gzip.open(path, 'rt') as f:
+            return f.readline().rstrip('\n')
+    except (IOError, OSError, EOFError):
+        return None
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            src=dict(type='path', required=True),
+            family=dict(type='str', default='netdev'),
+            table=dict(type='str', default='blocklist'),
+            set=dict(type='str', required=True),
+            batch_bytes=dict(type='int', default=262144),
+            state_path=dict(type='path'),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    nft = module.get_bin_path('nft', required=True)
+    family, table, prefix = params['family'], params['table'], params['set']
+    state_path = params['state_path'] or '/var/lib/ansible-firewall/feeds/%s-%s-%s.gz' % (family, table, prefix)
+    start = time.time()
+
+    header = set_handles(module, nft, family, table, prefix)
+    reloaded = stored_header(state_path) != header
+    held = set_lines(module, nft, family, table, prefix) if reloaded else None
+    old = (lambda: iter(held)) if reloaded else (lambda: lines(state_path))
+    counts = {'add': 0, 'delete': 0}
+    for verb, line in diff(old(), lines(params['src'])):
+        counts[verb] += 1
+    result = dict(changed=bool(counts['add'] or counts['delete']), added=counts['add'], deleted=counts['delete'],
+                  batches=0, reloaded=reloaded, timings={'diff': round((time.time() - start) * 1000.0, 1)})
+    if module.check_mode or not result['changed']:
+        module.exit_json(**result)
+
+    start = time.time()
+    slowest = 0.0
+    for command, deleted, added in transactions(family, table, prefix, diff(old(), lines(params['src'])),
+                                                params['batch_bytes']):
+        began = time.time()
+        rc, out, err = module.run_command([nft, '-f', '-'], data=command)
+        slowest = max(slowest, time.time() - began)
+        result['batches'] += 1
+        if rc != 0:
+            # Earlier transactions are in the sets and this one is not, so
+            # the record of the last load no longer holds; the next run
+            # diffs against what the sets contain.
+            if os.path.exists(state_path):
+                os.unlink(state_path)
+            module.fail_json(msg='feed transaction failed: %s' % err.strip(), **result)
+    result['timings'].update(apply=round((time.time() - start) * 1000.0, 1), batch_max=round(slowest * 1000.0, 1))
+
+    directory = os.path.dirname(state_path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+    tmp = os.path.join(module.tmpdir, os.path.basename(state_path))
+    with gzip.open(tmp, 'wb') as f:
+        f.write((header + '\n').encode('utf-8'))
+        with gzip.open(params['src'], 'rb') as src:
+            shutil.copyfileobj(src, f)
+    module.atomic_move(tmp, state_path)
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
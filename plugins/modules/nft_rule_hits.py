@@ -0,0 +1,201 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: nft_rule_hits
+short_description: Read per-rule packet counters of an applied nftables chain
+description:
+  - Lists one chain with C(nft -j list chain) and pairs each live rule with
+    the rule at the same position in the applied config file, so the
+    counters are keyed by the rule text the
+    C(thomasvincent.firewall.nft_compile) filter rendered.
+  - Counters restart at zero whenever the ruleset is loaded, so cumulative
+    totals are kept in C(state_path) and a counter lower than the last one
+    seen is treated as a reset.
+  - When the live chain and the config file disagree on the number of
+    rules, the live counters are ignored and the stored totals returned.
+  - Rules need a C(counter) statement or a named counter; compile with
+    C(counters=true) or C(counters=named).
+options:
+  path:
+    description: Applied ruleset config file.
+    type: path
+    default: /etc/nftables.conf
+  family:
+    description: Table family.
+    type: str
+    default: inet
+  table:
+    description: Table name.
+    type: str
+    default: filter
+  chain:
+    description: Chain name.
+    type: str
+    default: input
+  state_path:
+    description: File holding the cumulative totals. Set to an empty string to keep none.
+    type: path
+    default: /var/lib/ansible-firewall/nftables.hits
+author:
+  - Thomas Vincent
+'''
+
+EXAMPLES = r'''
+- name: Read rule hit counters
+  thomasvincent.firewall.nft_rule_hits:
+    path: /etc/nftables.conf
+  register: hits
+
+- name: Compile with the hottest rules first
+  ansible.builtin.set_fact:
+    compiled: "{{ policy | combine({'counters': true, 'hits': hits.hits}) | thomasvincent.firewall.nft_compile }}"
+'''
+
+RETURN = r'''
+hits:
+  description: Cumulative packet count per rendered rule text.
+  returned: always
+  type: dict
+  sample: {"ip saddr @lb_v4 tcp dport 443 counter accept": 918273}
+drift:
+  description: Whether the live chain did not match the config file, so live counters were ignored.
+  returned: always
+  type: bool
+rules:
+  description: Number of rules in the live chain.
+  returned: always
+  type: int
+'''
+
+import json
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.six import string_types
+
+
+def config_rules(text, family, table, chain):
+    """Rule lines of ``chain`` in a ruleset rendered by nft_compile, in order."""
+    rules = []
+    state = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if state is None:
+            if stripped == 'table %s %s {' % (family, table):
+                state = 'table'
+        elif state == 'table':
+            if stripped == 'chain %s {' % chain:
+                state = 'chain'
+            elif line.startswith('}'):
+                break
+        elif stripped == '}':
+            break
+        elif stripped and not stripped.startswith(('#', 'type ')):
+            rules.append(stripped)
+    return rules
+
+
+def named_counters(document):
+    """``{name: packets}`` from ``nft -j list counters`` output."""
+    return dict((item['counter']['name'], item['counter'].get('packets', 0))
+                for item in document.get('nftables', []) if 'counter' in item)
+
+
+def live_counters(document):
+    """Counter of every rule in ``nft -j list chain`` output, in order.
+
+    Each entry is a packet count, the name of the counter object the rule
+    updates, or None for a rule without a counter.
+    """
+    counters = []
+    for item in document.get('nftables', []):
+        rule = item.get('rule')
+        if rule is None:
+            continue
+        counter = None
+        for expr in rule.get('expr', []):
+            if isinstance(expr, dict) and 'counter' in expr:
+                counter = expr['counter']
+                counter = counter.get('packets', 0) if isinstance(counter, dict) else counter
+                break
+        counters.append(counter)
+    return counters
+
+
+def accumulate(stored, rules, counters):
+    """Fold the live counters into the stored ``{text: {last, total}}`` state."""
+    state = {}
+    for text, packets in zip(rules, counters):
+        if packets is None:
+            continue
+        previous = stored.get(text, {'last': 0, 'total': 0})
+        delta = packets - previous['last'] if packets >= previous['last'] else packets
+        state[text] = {'last': packets, 'total': previous['total'] + delta}
+    return state
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            path=dict(type='path', default='/etc/nftables.conf'),
+            family=dict(type='str', default='inet'),
+            table=dict(type='str', default='filter'),
+            chain=dict(type='str', default='input'),
+            state_path=dict(type='path', default='/var/lib/ansible-firewall/nftables.hits'),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    nft = module.get_bin_path('nft', required=True)
+
+    stored = {}
+    if params['state_path']:
+        try:
+            with open(params['state_path']) as f:
+                stored = json.load(f)
+        except (IOError, OSError, ValueError):
+            stored = {}
+
+    rc, out, err = module.run_command([nft, '-j', 'list', 'chain', params['family'], params['table'], params['chain']])
+    counters = []
+    if rc == 0:
+        try:
+            counters = live_counters(json.loads(out))
+            if any(isinstance(counter, string_types) for counter in counters):
+                rc, out, err = module.run_command([nft, '-j', 'list', 'counters', 'table',
+                                                   params['family'], params['table']])
+                named = named_counters(json.loads(out)) if rc == 0 else {}
+                counters = [named.get(c) if isinstance(c, string_types) else c for c in counters]
+        except (ValueError, AttributeError, KeyError):
+            module.fail_json(msg='cannot parse nft output', stdout=out)
+    try:
+        with open(params['path']) as f:
+            rules = config_rules(f.read(), params['family'], params['table'], params['chain'])
+    except (IOError, OSError):
+        rules = []
+
+    drift = len(rules) != len(counters)
+    state = stored if drift else accumulate(stored, rules, counters)
+    if params['state_path'] and state != stored and not module.check_mode:
+        directory = os.path.dirname(params['state_path'])
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        tmp = os.path.join(module.tmpdir, 'nftables.hits')
+        with open(tmp, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        module.atomic_move(tmp, params['state_path'])
+
+    module.exit_json(changed=False, drift=drift, rules=len(counters),
+                     hits=dict((text, entry['total']) for text, entry in state.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: nft_validate
+short_description: Validate every host's compiled ruleset on the controller
+description:
+  - Collects the C(thomasvincent.firewall.nft_compile) result of each play
+    host, deduplicates the rulesets by fingerprint and checks each distinct
+    one with C(nft -c -f) on the controller, in parallel.
+  - Each check runs in a fresh unprivileged user and network namespace
+    (C(unshare --user --map-root-user --net)), so no root is needed and the
+    controller's own ruleset is irrelevant. Requires C(nft) and C(unshare)
+    on the controller.
+  - Outcomes are cached by a hash of the nft version and the ruleset text.
+  - Fails listing the hosts of every invalid ruleset. Use with
+    C(run_once) after all hosts have compiled their policy.
+  - This is an action plugin; it never connects to the hosts.
+options:
+  hosts:
+    description: Hosts whose rulesets are validated. Defaults to C(ansible_play_hosts).
+    type: list
+    elements: str
+  var:
+    description: Host variable holding the C(nft_compile) result.
+    type: str
+    default: nftables_compiled
+  jobs:
+    description: Concurrent C(nft) processes. Defaults to the number of CPUs.
+    type: int
+  cache_dir:
+    description: Result cache directory. Defaults to a directory under Ansible's per-run local tmp.
+    type: path
+  sandbox:
+    description: Run C(nft -c) in an unprivileged namespace. Disable only when the controller runs Ansible as root.
+    type: bool
+    default: true
+  nft:
+    description: nft binary on the controller.
+    type: str
+    default: nft
+author:
+  - Thomas Vincent
+'''
+
+EXAMPLES = r'''
+- name: Validate compiled rulesets on the controller
+  thomasvincent.firewall.nft_validate:
+  run_once: true
+  any_errors_fatal: true
+'''
+
+RETURN = r'''
+hosts:
+  description: Number of hosts whose ruleset was validated.
+  returned: always
+  type: int
+hosts_missing:
+  description: Hosts without a compiled ruleset, which were skipped.
+  returned: always
+  type: list
+rulesets:
+  description: Number of distinct rulesets.
+  returned: always
+  type: int
+cache_hits:
+  description: Distinct rulesets whose outcome came from the cache.
+  returned: always
+  type: int
+invalid:
+  description: Invalid rulesets with their C(fingerprint), C(hosts) and nft C(error).
+  returned: always
+  type: list
+duration_ms:
+  description: Wall-clock time of the validation.
+  returned: always
+  type: float
+'''
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import ipaddress
+import random
+
+import pytest
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils import nft_cidr
+
+BACKENDS = [pytest.param(None, id='python'),
+            pytest.param(nft_cidr.numpy, id='numpy',
+                         marks=pytest.mark.skipif(nft_cidr.numpy is None, reason='numpy is not installed'))]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    monkeypatch.setattr(nft_cidr, 'numpy', request.param)
+
+
+def reference(entries):
+    """What ``collapse()`` should return, computed with ``ipaddress``."""
+    networks = {4: [], 6: []}
+    for entry in entries:
+        if '-' in entry:
+            first, last = (ipaddress.ip_address(part) for part in entry.split('-'))
+            found = list(ipaddress.summarize_address_range(first, last))
+        else:
+            found = [ipaddress.ip_network(entry, strict=False)]
+        networks[found[0].version].extend(found)
+    return tuple([str(n.network_address) if n.prefixlen == n.max_prefixlen else str(n)
+                  for n in ipaddress.collapse_addresses(networks[version])] for version in (4, 6))
+
+
+@pytest.mark.parametrize('entries', [
+    ['10.0.0.0/24', '10.0.1.0/24'],
+    ['10.0.0.0/8', '10.1.2.0/24', '10.255.255.255'],
+    ['192.0.2.0/25', '192.0.2.64/26', '192.0.2.128/25'],
+    ['192.0.2.1', '192.0.2.1', '192.0.2.2', '192.0.2.3'],
+    ['10.0.0.5/24'],
+    ['0.0.0.0/0', '192.0.2.0/24'],
+    ['255.255.255.255', '255.255.255.254'],
+    ['0.0.0.0', '255.255.255.255'],
+    ['10.0.0.1-10.0.0.6'],
+    ['0.0.0.0-255.255.255.255'],
+    ['192.0.2.250-192.0.3.5', '192.0.3.0/24'],
+    ['2001:db8::/33', '2001:db8:8000::/33', '2001:db8::1'],
+    ['2001:db8::1-2001:db8::ff', '::/0'],
+    ['10.0.0.0/24', '2001:db8::/32', '10.0.1.0/24', 'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'],
+    [],
+])
+def test_collapse_matches_ipaddress(backend, entries):
+    assert nft_cidr.collapse(entries) == reference(entries)
+
+
+def test_collapse_matches_ipaddress_on_random_entries(backend):
+    rng = random.Random(2026)
+    entries = []
+    for _ in range(2000):
+        value = rng.getrandbits(32) & 0xfff0ffff
+        if rng.random() < 0.2:
+            entries.append('%s-%s' % (ipaddress.IPv4Address(value),
+                                      ipaddress.IPv4Address(min(value + rng.randrange(4096), 0xffffffff))))
+        else:
+            entries.append('%s/%d' % (ipaddress.IPv4Address(value), rng.randrange(8, 33)))
+    assert nft_cidr.collapse(entries) == reference(entries)
+
+
+@pytest.mark.parametrize('entry', [
+    'example.com', '10.0.0.0/33', '10.0.0.256', '10.0.0.9-10.0.0.1', '10.0.0.1-2001:db8::1', '', None,
+])
+def test_collapse_rejects_invalid_entries(backend, entry):
+    with pytest.raises(ValueError, match='invalid address'):
+        nft_cidr.collapse(['10.0.0.0/24', entry])
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_delta import FullReload, plan
+
+
+def ruleset(rules, elements=(), flags=('interval',)):
+    return {
+        'flush': True,
+        'tables': [{
+            'family': 'inet',
+            'name': 'filter',
+            'objects': [],
+            'sets': [{'name': 'blocked', 'type': 'ipv4_addr', 'flags': list(flags),
+                      'options': [['auto-merge', None]] if 'interval' in flags else [],
+                      'elements': list(elements)}],
+            'chains': [{'name': 'input', 'type': 'filter', 'hook': 'input', 'priority': 0, 'policy': 'drop',
+                        'rules': list(rules)}],
+        }],
+    }
+
+
+def live(handles, sets=('blocked',)):
+    return {
+        'tables': set([('inet', 'filter')]),
+        'sets': set(('inet', 'filter', name) for name in sets),
+        'chains': {('inet', 'filter', 'input'): list(handles)},
+    }
+
+
+def commands(batches):
+    return [command for batch in batches for command in batch['commands']]
+
+
+RULES = ['ct state established,related accept', 'ip saddr @blocked drop', 'tcp dport 22 accept']
+
+
+def test_unchanged_ruleset_plans_nothing():
+    batches, delta, _ = plan(ruleset(RULES), ruleset(RULES), live([4, 5, 6]))
+    assert batches == []
+    assert not any(delta.values())
+
+
+def test_inserted_rule_goes_before_the_next_handle():
+    rules = RULES[:2] + ['tcp dport 80 accept'] + RULES[2:]
+    batches, delta, _ = plan(ruleset(RULES), ruleset(rules), live([4, 5, 6]))
+    assert commands(batches) == ['insert rule inet filter input position 6 tcp dport 80 accept']
+    assert delta['rules_added'] == 1
+
+
+def test_appended_rule_is_added_at_the_end():
+    batches, _, _ = plan(ruleset(RULES), ruleset(RULES + ['tcp dport 443 accept']), live([4, 5, 6]))
+    assert commands(batches) == ['add rule inet filter input tcp dport 443 accept']
+
+
+def test_deleted_rule_is_deleted_by_handle():
+    batches, delta, _ = plan(ruleset(RULES), ruleset([RULES[0], RULES[2]]), live([4, 5, 6]))
+    assert commands(batches) == ['delete rule inet filter input handle 5']
+    assert delta['rules_deleted'] == 1
+
+
+def test_changed_rule_is_replaced_in_place():
+    rules = RULES[:2] + ['tcp dport 2222 accept']
+    batches, delta, _ = plan(ruleset(RULES), ruleset(rules), live([4, 5, 6]))
+    assert commands(batches) == ['replace rule inet filter input handle 6 tcp dport 2222 accept']
+    assert delta['rules_replaced'] == 1
+
+
+def test_interval_set_changes_name_merged_intervals():
+    previous = ruleset(RULES, ['10.0.0.0/24', '192.0.2.0/24'])
+    desired = ruleset(RULES, ['10.0.0.0/24', '10.0.1.0/24', '198.51.100.7'])
+    batches, delta, _ = plan(previous, desired, live([4, 5, 6]))
+    # 10.0.0.0/24 and 10.0.1.0/24 are one interval under auto-merge.
+    assert commands(batches) == [
+        'delete element inet filter blocked { 10.0.0.0/24, 192.0.2.0/24 }',
+        'add element inet filter blocked { 10.0.0.0/23, 198.51.100.7 }',
+    ]
+    assert (delta['elements_deleted'], delta['elements_added']) == (2, 2)
+
+
+def test_changed_set_declaration_needs_full_reload():
+    previous = ruleset(RULES, ['10.0.0.1'], flags=())
+    desired = ruleset(RULES, ['10.0.0.0/24'])
+    with pytest.raises(FullReload):
+        plan(previous, desired, live([4, 5, 6]))
+
+
+def test_missing_rule_handle_needs_full_reload():
+    with pytest.raises(FullReload, match='2 live rules, 3 expected'):
+        plan(ruleset(RULES), ruleset(RULES + ['tcp dport 443 accept']), live([4, 6]))
+
+
+def test_missing_previous_state_needs_full_reload():
+    with pytest.raises(FullReload):
+        plan(None, ruleset(RULES), live([4, 5, 6]))
+
+
+SWAP = ['10.%d.0.0/24' % (2 * n) for n in range(10)]
+
+
+def test_small_set_change_stays_in_place():
+    previous = ruleset(RULES, SWAP[:8])
+    batches, delta, state = plan(previous, ruleset(RULES, SWAP[:9]), live([4, 5, 6]), shadow_threshold=5)
+    assert [batch['kind'] for batch in batches] == ['commit']
+    assert commands(batches) == ['add element inet filter blocked { 10.16.0.0/24 }']
+    assert delta['sets_swapped'] == 0
+    assert state['aliases'] == {}
+
+
+def test_large_set_change_fills_a_shadow_and_switches_rules():
+    batches, delta, state = plan(ruleset(RULES), ruleset(RULES, SWAP), live([4, 5, 6]), shadow_threshold=5)
+    fill, commit = batches
+    assert fill['kind'] == 'fill'
+    assert fill['set'] == 'inet filter blocked_b'
+    assert fill['commands'] == [
+        'add set inet filter blocked_b { type ipv4_addr; flags interval; auto-merge; }',
+        'add element inet filter blocked_b { %s }' % ', '.join(SWAP),
+    ]
+    # Rules move to the shadow before the set they used is deleted.
+    assert commit == {'kind': 'commit', 'commands': [
+        'replace rule inet filter input handle 5 ip saddr @blocked_b drop',
+        'delete set inet filter blocked',
+    ]}
+    assert (delta['sets_swapped'], delta['elements_filled']) == (1, 10)
+    assert state['aliases'] == {'inet filter blocked': 'blocked_b'}
+    assert state['tables'][0]['sets'][0]['name'] == 'blocked_b'
+    assert 'ip saddr @blocked_b drop' in state['tables'][0]['chains'][0]['rules']
+
+
+def test_shadowed_set_changes_in_place_under_its_alias():
+    _, _, state = plan(ruleset(RULES), ruleset(RULES, SWAP), live([4, 5, 6]), shadow_threshold=5)
+    batches, _, state = plan(state, ruleset(RULES, SWAP[:9]), live([4, 7, 6], sets=['blocked_b']),
+                             shadow_threshold=5)
+    assert commands(batches) == ['delete element inet filter blocked_b { 10.18.0.0/24 }']
+    assert state['aliases'] == {'inet filter blocked': 'blocked_b'}
+
+
+def test_next_swap_returns_to_the_declared_name():
+    _, _, state = plan(ruleset(RULES), ruleset(RULES, SWAP), live([4, 5, 6]), shadow_threshold=5)
+    batches, _, state = plan(state, ruleset(RULES), live([4, 7, 6], sets=['blocked_b']), shadow_threshold=5)
+    fill, commit = batches
+    assert fill['set'] == 'inet filter blocked'
+    assert commit['commands'] == [
+        'replace rule inet filter input handle 7 ip saddr @blocked drop',
+        'delete set inet filter blocked_b',
+    ]
+    assert state['aliases'] == {}
+    assert state['tables'][0]['sets'][0]['name'] == 'blocked'
+
+
+def test_dynamic_set_is_never_shadowed():
+    previous = ruleset(RULES, flags=('dynamic',))
+    batches, delta, _ = plan(previous, ruleset(RULES, ['10.0.0.%d' % n for n in range(10)], flags=('dynamic',)),
+                             live([4, 5, 6]), shadow_threshold=5)
+    assert [batch['kind'] for batch in batches] == ['commit']
+    assert delta['sets_swapped'] == 0
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_ir import Match, Rule
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_optimize import aggregate, reorder
+
+
+def port(value, verdict, *statements):
+    return Rule([Match('tcp dport', value)], list(statements), verdict)
+
+
+def rendered(rules):
+    return [rule.render() for rule in rules]
+
+
+def test_same_verdict_folds_into_set():
+    rules, removed = aggregate([port('22', 'accept'), port('80', 'accept'), port('443', 'accept')])
+    assert rendered(rules) == ['tcp dport { 22, 80, 443 } accept']
+    assert removed == 2
+
+
+def test_different_verdicts_fold_into_vmap():
+    rules, removed = aggregate([port('22', 'accept'), port('23', 'drop')])
+    assert rendered(rules) == ['tcp dport vmap { 22 : accept, 23 : drop }']
+    assert removed == 1
+
+
+def test_overlapping_values_do_not_fold():
+    rules, removed = aggregate([port('20-30', 'accept'), port('25', 'drop')])
+    assert rendered(rules) == ['tcp dport 20-30 accept', 'tcp dport 25 drop']
+    assert removed == 0
+
+
+def test_identical_rule_after_terminal_verdict_is_shadowed():
+    rules, removed = aggregate([port('22', 'accept'), port('22', 'drop')])
+    assert rendered(rules) == ['tcp dport 22 accept']
+    assert removed == 1
+
+
+def test_duplicate_value_after_terminal_verdict_is_dropped():
+    rules, _ = aggregate([port(('22', '80'), 'accept'), port('22', 'drop'), port('443', 'drop')])
+    assert rendered(rules) == ['tcp dport vmap { 22 : accept, 80 : accept, 443 : drop }']
+
+
+def test_identical_rule_after_jump_is_kept():
+    rules, removed = aggregate([port('22', 'jump audit'), port('22', 'accept')])
+    assert rendered(rules) == ['tcp dport 22 jump audit', 'tcp dport 22 accept']
+    assert removed == 0
+
+
+def test_identical_rule_after_continue_is_kept():
+    rules, _ = aggregate([port('22', 'continue'), port('22', 'accept')])
+    assert rendered(rules) == ['tcp dport 22 continue', 'tcp dport 22 accept']
+
+
+def test_duplicate_value_after_continue_ends_the_run():
+    rules, _ = aggregate([port(('22', '80'), 'continue'), port('22', 'accept')])
+    assert rendered(rules) == ['tcp dport { 22, 80 } continue', 'tcp dport 22 accept']
+
+
+def test_distinct_values_after_continue_still_fold():
+    rules, _ = aggregate([port('22', 'continue'), port('80', 'accept')])
+    assert rendered(rules) == ['tcp dport vmap { 22 : continue, 80 : accept }']
+
+
+def test_jump_never_enters_a_vmap():
+    rules, _ = aggregate([port('22', 'jump audit'), port('80', 'accept')])
+    assert rendered(rules) == ['tcp dport 22 jump audit', 'tcp dport 80 accept']
+
+
+def test_reorder_moves_hot_rule_past_disjoint_one():
+    rules = [port('22', 'drop'), port('80', 'accept')]
+    ordered, report = reorder(rules, {'tcp dport 80 accept': 100, 'tcp dport 22 drop': 1})
+    assert rendered(ordered) == ['tcp dport 80 accept', 'tcp dport 22 drop']
+    assert report['rules_moved'] == 2
+
+
+def test_reorder_keeps_overlapping_rules_with_different_verdicts():
+    rules = [port('22', 'jump audit'), port('20-30', 'accept')]
+    ordered, report = reorder(rules, {'tcp dport 20-30 accept': 100})
+    assert rendered(ordered) == rendered(rules)
+    assert report['rules_moved'] == 0
+
+
+def test_reorder_moves_past_duplicate_with_same_verdict():
+    rules = [port('22', 'accept'), port(('22', '80'), 'accept')]
+    ordered, _ = reorder(rules, {'tcp dport { 22, 80 } accept': 5})
+    assert rendered(ordered) == ['tcp dport { 22, 80 } accept', 'tcp dport 22 accept']
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2026, Thomas Vincent
+# MIT License (see galaxy.yml)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.thomasvincent.firewall.plugins.module_utils.nft_setsize import estimate, hints
+
+
+def addresses(count):
+    return ['10.0.%d.%d' % divmod(n, 256) for n in range(count)]
+
+
+@pytest.mark.parametrize('count, size', [(1, 64), (32, 64), (33, 128), (64, 128), (65, 256), (5000, 16384)])
+def test_exact_set_size_is_a_power_of_two_with_headroom(count, size):
+    assert hints('ipv4_addr', addresses(count)) == (False, size, 'performance')
+
+
+def test_prefix_or_range_needs_an_interval_set():
+    assert hints('ipv4_addr', ['10.0.0.1', '10.0.1.0/24']) == (True, None, 'performance')
+    assert hints('ipv4_addr', ['10.0.0.1-10.0.0.9']) == (True, None, 'performance')
+
+
+def test_empty_set_is_declared_as_interval():
+    assert hints('ipv4_addr', []) == (True, None, 'performance')
+
+
+def test_sized_port_set_uses_a_fixed_size_backend():
+    _, size, policy = hints('inet_service', [str(port) for port in range(100)])
+    assert estimate('inet_service', [], size, policy, 100)[0] == 'hash'
+    _, size, policy = hints('inet_service', [str(port) for port in range(5000)])
+    assert estimate('inet_service', [], size, policy, 5000)[0] == 'bitmap'
+
+
+def test_overrides_replace_the_chosen_hints():
+    assert hints('ipv4_addr', addresses(10), {'size': 1000}) == (False, 1000, 'performance')
+    assert hints('ipv4_addr', addresses(10), {'policy': 'memory'}) == (False, 64, 'memory')
+    assert hints('ipv4_addr', addresses(10), {'interval': True}) == (True, None, 'performance')
+    assert hints('ipv4_addr', addresses(10), {'size': 10}) == (False, 10, 'performance')
+
+
+@pytest.mark.parametrize('override, message', [
+    ({'buckets': 4}, 'unsupported set hints: buckets'),
+    ({'interval': False}, 'interval: false'),
+    ({'size': 2}, 'at least 3'),
+    ({'size': '64'}, 'must be an integer'),
+    ({'size': True}, 'must be an integer'),
+    ({'policy': 'fast'}, 'policy must be performance or memory'),
+])
+def test_contradicting_overrides_are_rejected(override, message):
+    with pytest.raises(ValueError, match=message):
+        hints('ipv4_addr', ['10.0.0.1', '10.0.0.2', '10.0.0.0/24'] if 'interval' in override else addresses(3),
+              override)